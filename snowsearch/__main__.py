@@ -7,119 +7,206 @@ Description: Entry for interacting with snowball
 """
 
 import asyncio
-import csv
+import io
+import os
 from argparse import Namespace
-from os.path import exists
-from pathlib import Path
-from typing import List
+from typing import List, TYPE_CHECKING
 
 import loggy
-from dotenv import load_dotenv
-
-from cli.client_factory import ClientFactory
-from cli.cmd.inspect import run_inspect
-from cli.cmd.rank import run_rank
-from cli.cmd.search import run_search
-from cli.cmd.slr import run_slr
-from cli.cmd.snowball import run_snowball
-from cli.cmd.upload import run_upload
+
 from cli.parser import parse_arguments
-from config.parser import Config, DEFAULT_CONFIG_PATH
-from db.paper_database import PaperDatabase
 
+if TYPE_CHECKING:
+    from cli.client_factory import ClientFactory
+    from config.parser import Config
+    from db.paper_database import PaperDatabase
+
+CSV_READ_BUFFER = 256 * 1024  # 256 KB
 
-async def _execute(db: PaperDatabase, config: Config, args: Namespace) -> None:
+
+def _load_papers_from_csv(csv_path: str) -> List[str]:
     """
-    Execute a given cli command
+    Load a list of papers from a csv file
+
+    :param csv_path: Path to csv file with paper titles
+    :return: List of loaded titles
+    """
+    import csv  # lazy load
+    # read and decode in one pass rather than in small chunks
+    with open(csv_path, 'rb', buffering=CSV_READ_BUFFER) as f:
+        text = f.read().decode('utf-8')
+    # dedupe while preserving order, skip empty rows
+    return list(dict.fromkeys(r[0] for r in csv.reader(io.StringIO(text, newline='')) if r))
+
+
+def _load_paper_titles(args: Namespace) -> List[str] | None:
+    """
+    Load paper titles from the args if provided
+
+    :param args: Args with papers and papers input
+    :return: List of paper titles, None if not provided
+    """
+    papers = None
+    # load titles if provided
+    if args.papers_input:
+        papers = _load_papers_from_csv(args.papers_input)
+    if args.papers:
+        papers = list(dict.fromkeys(args.papers))
+    return papers
+
+
+async def _run_slr_command(db: "PaperDatabase", config: "Config", cf: "ClientFactory", args: Namespace) -> None:
+    """
+    Execute the slr command
 
     :param db: Paper database
     :param config: Config details
+    :param cf: Factory to create clients with
     :param args: args to get command details from
     """
+    from cli.cmd.slr import run_slr  # lazy load
+    # todo - log if fail to connect to ollama / openai
+    await run_slr(db, config, cf, args.semantic_search,
+                  oa_query=args.query,
+                  skip_paper_ranking=args.skip_ranking,
+                  json_output=args.json,
+                  ignore_quota=args.ignore_quota,
+                  use_ranking_cache=not args.no_cache,
+                  zotero_client=cf.create_zotero_client(args))
+
+
+async def _run_snowball_command(db: "PaperDatabase", config: "Config", cf: "ClientFactory", args: Namespace) -> None:
+    """
+    Execute the snowball command
+
+    :param db: Paper database
+    :param config: Config details
+    :param cf: Factory to create clients with
+    :param args: args to get command details from
+    """
+    from cli.cmd.snowball import run_snowball  # lazy load
+    # load args
+    round_quota = None if args.no_limit else config.snowball.round_quota
+    papers = _load_paper_titles(args)
+
+    # start snowball
+    await run_snowball(db, config.snowball, cf.create_openalex_client(), cf.create_grobid_worker(),
+                       nl_query=args.semantic_search,
+                       round_quota=round_quota,
+                       seed_paper_titles=papers,
+                       ignore_quota=args.ignore_quota)
 
-    def __load_papers_from_csv(csv_path: str) -> List[str]:
-        """
-        Load a list of papers from a csv file
-
-        :param csv_path: Path to csv file with paper titles
-        :return: List of loaded titles
-        """
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            return list({r[0] for r in csv.reader(f)})
-
-    cf = ClientFactory(config)
-
-    match args.command:
-        case 'slr':
-            # todo - log if fail to connect to ollama / openai
-            await run_slr(db, config, cf, args.semantic_search,
-                          oa_query=args.query,
-                          skip_paper_ranking=args.skip_ranking,
-                          json_output=args.json,
-                          ignore_quota=args.ignore_quota,
-                          zotero_client=cf.create_zotero_client(args))
-        case 'snowball':
-            # load args
-            round_quota = None if args.no_limit else config.snowball.round_quota
-            papers = None
-            # load titles if provided
-            if args.papers_input:
-                papers = __load_papers_from_csv(args.papers_input)
-            if args.papers:
-                papers = list(set(args.papers))
-
-            # start snowball
-            await run_snowball(db, config.snowball, cf.create_openalex_client(), cf.create_grobid_worker(),
-                               nl_query=args.semantic_search,
-                               round_quota=round_quota,
-                               seed_paper_titles=papers,
-                               ignore_quota=args.ignore_quota)
-
-        case 'search':
-            papers = run_search(db, args.semantic_search,
-                                paper_limit=args.limit,
-                                exact_match=args.exact_match,
-                                only_open_access=args.only_open_access,
-                                only_processed=args.only_processed,
-                                min_similarity_score=args.min_similarity_score,
-                                order_by_abstract=args.order_by_abstract,
-                                json_output=args.json)
-
-            # upload papers if args provided
-            zc = cf.create_zotero_client(args)
-            if zc:
-                await zc.upload_papers(papers)
-
-        case 'inspect':
-            run_inspect(db, args.paper_title)
-
-        case 'rank':
-            rank_config = config.ranking
-            # load args
-            papers = None
-            # load titles if provided
-            if args.papers_input:
-                papers = __load_papers_from_csv(args.papers_input)
-            if args.papers:
-                papers = list(set(args.papers))
-
-            # start rank
-            top_n_papers = args.limit or rank_config.top_n_papers  # use config as fallback
-            min_score = rank_config.min_abstract_score if args.min_similarity_score is None \
-                else args.min_similarity_score
-
-            await run_rank(db, cf.create_rank_client(), config.ranking.tokens_per_word, args.semantic_search,
-                           top_n_papers,
-                           min_score,
-                           json_output=args.json,
-                           paper_titles_to_rank=papers,
-                           zotero_client=cf.create_zotero_client(args))
-
-        case 'upload':
-            # set file paths
-            paper_pdf_paths = [args.file] if args.file \
-                else [str(f) for f in Path(args.directory).iterdir() if f.is_file()]
-            await run_upload(db, cf.create_openalex_client(), cf.create_grobid_worker(), paper_pdf_paths)
+
+async def _run_search_command(db: "PaperDatabase", _config: "Config | None", cf: "ClientFactory",
+                              args: Namespace) -> None:
+    """
+    Execute the search command
+
+    :param db: Paper database
+    :param _config: Unused, config is not loaded for this command
+    :param cf: Factory to create clients with
+    :param args: args to get command details from
+    """
+    from cli.cmd.search import run_search  # lazy load
+    papers = run_search(db, args.semantic_search,
+                        paper_limit=args.limit,
+                        exact_match=args.exact_match,
+                        only_open_access=args.only_open_access,
+                        only_processed=args.only_processed,
+                        min_similarity_score=args.min_similarity_score,
+                        order_by_abstract=args.order_by_abstract,
+                        json_output=args.json)
+
+    # upload papers if args provided
+    zc = cf.create_zotero_client(args)
+    if zc:
+        await zc.upload_papers(papers)
+
+
+async def _run_inspect_command(db: "PaperDatabase", _config: "Config | None", _cf: "ClientFactory",
+                               args: Namespace) -> None:
+    """
+    Execute the inspect command
+
+    :param db: Paper database
+    :param _config: Unused, config is not loaded for this command
+    :param _cf: Unused, factory to create clients with
+    :param args: args to get command details from
+    """
+    from cli.cmd.inspect import run_inspect  # lazy load
+    run_inspect(db, args.paper_title)
+
+
+async def _run_rank_command(db: "PaperDatabase", config: "Config", cf: "ClientFactory", args: Namespace) -> None:
+    """
+    Execute the rank command
+
+    :param db: Paper database
+    :param config: Config details
+    :param cf: Factory to create clients with
+    :param args: args to get command details from
+    """
+    from cli.cmd.rank import run_rank  # lazy load
+    rank_config = config.ranking
+    # load args
+    papers = _load_paper_titles(args)
+
+    # start rank
+    top_n_papers = args.limit or rank_config.top_n_papers  # use config as fallback
+    min_score = rank_config.min_abstract_score if args.min_similarity_score is None \
+        else args.min_similarity_score
+
+    await run_rank(db, cf.create_abstract_ranker(use_cache=not args.no_cache), args.semantic_search,
+                   top_n_papers,
+                   min_score,
+                   json_output=args.json,
+                   paper_titles_to_rank=papers,
+                   zotero_client=cf.create_zotero_client(args))
+
+
+async def _run_upload_command(db: "PaperDatabase", _config: "Config", cf: "ClientFactory", args: Namespace) -> None:
+    """
+    Execute the upload command
+
+    :param db: Paper database
+    :param _config: Unused, config details
+    :param cf: Factory to create clients with
+    :param args: args to get command details from
+    """
+    from cli.cmd.upload import run_upload  # lazy load
+    # set file paths
+    if args.file:
+        paper_pdf_paths = [args.file]
+    else:
+        # dir entries cache file type, avoids stat per file
+        with os.scandir(args.directory) as entries:
+            paper_pdf_paths = [e.path for e in entries if e.is_file()]
+    await run_upload(db, cf.create_openalex_client(), cf.create_grobid_worker(), paper_pdf_paths)
+
+
+# handler for each cli command
+_COMMAND_HANDLERS = {
+    'slr': _run_slr_command,
+    'snowball': _run_snowball_command,
+    'search': _run_search_command,
+    'inspect': _run_inspect_command,
+    'rank': _run_rank_command,
+    'upload': _run_upload_command
+}
+
+
+async def _execute(db: "PaperDatabase", config: "Config | None", args: Namespace) -> None:
+    """
+    Execute a given cli command
+
+    :param db: Paper database
+    :param config: Config details, None if not needed by the command
+    :param args: args to get command details from
+    """
+    from cli.client_factory import ClientFactory  # lazy load
+    # close any client sessions once the command finishes
+    async with ClientFactory(config) as cf:
+        await _COMMAND_HANDLERS[args.command](db, config, cf, args)
 
 
 def main() -> None:
@@ -135,8 +222,12 @@ def main() -> None:
         # else update if option
         loggy.set_log_level(args.log_level)
 
-    # load config details
-    config = Config(args.config or (DEFAULT_CONFIG_PATH if exists(DEFAULT_CONFIG_PATH) else None))
+    # load config details only if needed by the command
+    config = None
+    if getattr(args, 'needs_config', True):
+        from config.parser import Config  # lazy load
+        config = Config(args.config)
+    from db.paper_database import PaperDatabase  # lazy load
     with PaperDatabase() as db:
         try:
             asyncio.run(_execute(db, config, args))
@@ -145,5 +236,6 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv  # lazy load
     load_dotenv()
     main()
@@ -7,7 +7,7 @@ Description: Util factory to streaming the creation of Client interfaces
 """
 import os
 from argparse import Namespace
-from dataclasses import asdict
+from typing import List, Dict, Tuple, Any
 
 from llumpy import AsyncModelClient, AsyncOllamaClient, AsyncOpenAIClient
 
@@ -15,6 +15,8 @@ from config.parser import Config, AgentConfigDTO
 from db.zotero import LibraryType, ZoteroClient
 from grobid.worker import GrobidWorker
 from openalex.client import OpenAlexClient
+from rank.abstract_ranker import AbstractRanker
+from rank.ranking_cache import RankingCache
 
 
 class ClientFactory:
@@ -29,35 +31,98 @@ class ClientFactory:
         :param config: Object with config details
         """
         self._config = config
+        # decide the model provider once, changing the env var after this has no effect
+        self._use_openai = bool(os.getenv('OPENAI_API_KEY'))
+        # track clients with open sessions to close on exit
+        self._openalex_clients: List[OpenAlexClient] = []
+        # model clients by agent config, query generation and ranking often share the same model
+        self._model_clients: Dict[Tuple[Any, ...], AsyncModelClient] = {}
+        # abstract rankers by if they use the ranking cache
+        self._abstract_rankers: Dict[bool, AbstractRanker] = {}
+        # only connect to grobid once, the worker limits are shared by every command step
+        self._grobid_worker: GrobidWorker | None = None
+
+    async def __aenter__(self) -> "ClientFactory":
+        """
+        :return: Self
+        """
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        """
+        Close all clients created by this factory
+        """
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close the sessions of all clients created by this factory
+        """
+        for client in self._openalex_clients:
+            await client.close()
+        self._openalex_clients.clear()
+        if self._grobid_worker:
+            await self._grobid_worker.close()
 
     def create_openalex_client(self) -> OpenAlexClient:
         """
         :return: OpenAlex Client
         """
-        return OpenAlexClient(self._config.openalex.email)
+        client = OpenAlexClient(self._config.openalex.email, self._config.openalex.max_concurrent_requests)
+        self._openalex_clients.append(client)
+        return client
 
     def create_grobid_worker(self) -> GrobidWorker:
         """
+        Get the Grobid worker, only creating and connecting once per factory
+
         :return: Grobid Client
         """
-        return GrobidWorker(
-            self._config.grobid.max_grobid_requests,
-            self._config.grobid.max_concurrent_downloads,
-            self._config.grobid.max_local_pdfs,
-            self._config.grobid.client_params
-        )
+        if not self._grobid_worker:
+            self._grobid_worker = GrobidWorker(
+                self._config.grobid.max_grobid_requests,
+                self._config.grobid.max_concurrent_downloads,
+                self._config.grobid.max_local_pdfs,
+                self._config.grobid.client_params
+            )
+        return self._grobid_worker
+
+    def _get_model_client(self, agent_config: AgentConfigDTO) -> AsyncModelClient:
+        """
+        Get the model client for the agent config, only creating and verifying a new client once per config
+
+        :param agent_config: Agent config to use to make the client
+        :return: Model Client
+        """
+        key = (agent_config.model_name, agent_config.model_tag, agent_config.ollama_host, agent_config.ollama_port)
+        if key not in self._model_clients:
+            self._model_clients[key] = _create_model_client(agent_config, self._use_openai)
+        return self._model_clients[key]
 
     def create_query_generation_client(self) -> AsyncModelClient:
         """
         :return: Model Client for query generation
         """
-        return _create_model_client(self._config.query_generation)
+        return self._get_model_client(self._config.query_generation)
 
     def create_rank_client(self) -> AsyncModelClient:
         """
         :return: Model Client for ranking papers
         """
-        return _create_model_client(self._config.ranking.agent_config)
+        return self._get_model_client(self._config.ranking.agent_config)
+
+    def create_abstract_ranker(self, use_cache: bool = True) -> AbstractRanker:
+        """
+        Get the abstract ranker, only creating it once per factory
+
+        :param use_cache: Reuse and save rankings in the persistent ranking cache (Default: True)
+        :return: Abstract ranker using the ranking model client
+        """
+        if use_cache not in self._abstract_rankers:
+            self._abstract_rankers[use_cache] = AbstractRanker(self.create_rank_client(),
+                                                               self._config.ranking.tokens_per_word,
+                                                               ranking_cache=RankingCache() if use_cache else None)
+        return self._abstract_rankers[use_cache]
 
     @staticmethod
     def create_zotero_client(args: Namespace) -> ZoteroClient | None:
@@ -79,13 +144,18 @@ class ClientFactory:
         return None
 
 
-def _create_model_client(agent_config: AgentConfigDTO) -> AsyncModelClient:
+def _create_model_client(agent_config: AgentConfigDTO, use_openai: bool) -> AsyncModelClient:
     """
     Create a model client using the provided agent config
-    Will return OpenAI if OPENAI_API_KEY env var is set, else Ollama
 
     :param agent_config: Agent config to use to make the client
+    :param use_openai: Use OpenAI if True, ie OPENAI_API_KEY env var is set, else Ollama
     :return: Model Client
     """
-    return AsyncOpenAIClient(agent_config.model_name) if os.getenv('OPENAI_API_KEY') else AsyncOllamaClient(
-        **asdict(agent_config))
+    if use_openai:
+        return AsyncOpenAIClient(agent_config.model_name)
+    # pass fields directly rather than deep copying the config with asdict
+    return AsyncOllamaClient(model_name=agent_config.model_name,
+                             model_tag=agent_config.model_tag,
+                             ollama_host=agent_config.ollama_host,
+                             ollama_port=agent_config.ollama_port)
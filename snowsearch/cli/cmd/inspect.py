@@ -8,7 +8,7 @@ Description: Get details about a paper printed to stdout
 import loggy
 
 from db.paper_database import PaperDatabase
-from util.output import print_ranked_papers
+from util.output import print_paper_details
 
 
 def run_inspect(db: PaperDatabase, paper_title: str) -> None:
@@ -24,5 +24,5 @@ def run_inspect(db: PaperDatabase, paper_title: str) -> None:
         loggy.warn(f"Could not find paper '{paper_title}'")
         return
 
-    # print table
-    print_ranked_papers(db, [paper], include_abstract=True)
+    # print details
+    print_paper_details(db, paper)
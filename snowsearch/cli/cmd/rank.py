@@ -6,33 +6,32 @@ Description: Use an LLM to rank papers based on a search term
 @author Derek Garcia
 """
 
-from typing import List
+from typing import List, TYPE_CHECKING
 
 import loggy
-from llumpy import AsyncModelClient
 
-from db.paper_database import PaperDatabase
-from db.zotero import ZoteroClient
-from rank.abstract_ranker import AbstractRanker
 from util.output import write_papers_to_json, print_ranked_papers
 from util.verify import validate_all_papers_found
 
+if TYPE_CHECKING:
+    from db.paper_database import PaperDatabase
+    from db.zotero import ZoteroClient
+    from rank.abstract_ranker import AbstractRanker
 
-async def run_rank(db: PaperDatabase,
-                   rank_client: AsyncModelClient,
-                   tokens_per_word: float,
+
+async def run_rank(db: "PaperDatabase",
+                   ranker: "AbstractRanker",
                    nl_query: str,
                    paper_limit: int,
                    min_similarity_score: float,
                    json_output: str = None,
                    paper_titles_to_rank: List[str] = None,
-                   zotero_client: ZoteroClient = None) -> None:
+                   zotero_client: "ZoteroClient" = None) -> None:
     """
     Use an LLM to rank papers based on their relevance to the query.
 
     :param db: Database to store paper results in
-    :param rank_client: Client to AI model to use for ranking
-    :param tokens_per_word: Estimate of tokens per word for the model
+    :param ranker: Ranker to use to rank the paper abstracts
     :param nl_query: Natural language search query to match papers to
     :param paper_limit: Max number of papers to rank that overrides the config (Default: None)
     :param json_output: Path to save results to instead of printing to stdout (Default: None)
@@ -43,8 +42,10 @@ async def run_rank(db: PaperDatabase,
     # get papers from database if provided
     if paper_titles_to_rank:
         papers_to_rank = db.get_papers(paper_titles_to_rank)
-        for missing_title in validate_all_papers_found(paper_titles_to_rank, papers_to_rank):
-            loggy.warn(f"Could not find paper '{missing_title}' in the database")
+        # report all missing papers at once
+        if missing_titles := validate_all_papers_found(paper_titles_to_rank, papers_to_rank):
+            loggy.warn(f"Could not find {len(missing_titles)} paper(s) in the database: "
+                       f"{', '.join(repr(t) for t in missing_titles)}")
     else:
         papers_to_rank = db.search_papers_by_nl_query(nl_query,
                                                       require_abstract=True,
@@ -55,14 +56,14 @@ async def run_rank(db: PaperDatabase,
     # error if no papers
     if not papers_to_rank:
         loggy.warn("No papers to rank, exiting early. . .")
+        return
 
     # rank papers
-    ranker = AbstractRanker(rank_client, tokens_per_word)
     ranked_papers = await ranker.rank_paper_abstracts(nl_query, papers_to_rank)
 
     # handle output
     if json_output:
-        json_output = write_papers_to_json(db, json_output, ranked_papers, model_used=rank_client.model,
+        json_output = write_papers_to_json(db, json_output, ranked_papers, model_used=ranker.model,
                                            nl_query=nl_query)
         loggy.info(f"Results saved to '{json_output}'")
     else:
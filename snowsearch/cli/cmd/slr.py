@@ -4,6 +4,9 @@ Description: Orchestrate entire strategic literature review pipeline
 
 @author Derek Garcia
 """
+import asyncio
+from typing import Tuple
+
 import loggy
 from loggy import Timer
 
@@ -12,10 +15,53 @@ from cli.cmd.snowball import snowball
 from config.parser import Config
 from db.paper_database import PaperDatabase
 from db.zotero import ZoteroClient
-from rank.abstract_ranker import AbstractRanker
+from openalex.client import OpenAlexClient
 from util.output import write_papers_to_json, print_ranked_papers
 
 
+async def _start_run(db: PaperDatabase,
+                     client_factory: ClientFactory,
+                     openalex_client: OpenAlexClient,
+                     nl_query: str,
+                     oa_query: str = None) -> Tuple[int, str]:
+    """
+    Start a new run and save the OpenAlex query to use, loading the embedding model and connecting to the
+    database in the background while the query is generated
+
+    :param db: Database to store paper results in
+    :param client_factory: Factory for generating clients as needed
+    :param openalex_client: Client to generate the OpenAlex query with
+    :param nl_query: Natural language search query to match papers to
+    :param oa_query: Elasticsearch-like query to use for search OpenAlex instead of generating one (Default: None)
+    :return: ID of the new run and the OpenAlex query to search with
+    """
+    loop = asyncio.get_running_loop()
+    embedding_model_load = loop.run_in_executor(None, db.load_embedding_model, True)
+    start_run = loop.run_in_executor(None, db.start_run)
+    success = False
+    try:
+        # generate query if none provided
+        oa_query_model_name = None
+        if oa_query:
+            loggy.info(f"Using provided OpenAlex | {oa_query}")
+        else:
+            oa_query_model = client_factory.create_query_generation_client()
+            oa_query = await openalex_client.generate_openalex_query(oa_query_model, nl_query)
+            oa_query_model_name = oa_query_model.model
+        run_id = await start_run
+        db.insert_openalex_query(run_id, oa_query_model_name, nl_query, oa_query)
+
+        # embeddings are needed to save the search results
+        await embedding_model_load
+        success = True
+        return run_id, oa_query
+    finally:
+        # always wait for the background work so errors are retrieved, closing the run if it won't be used
+        _, started_run = await asyncio.gather(embedding_model_load, start_run, return_exceptions=True)
+        if not success and not isinstance(started_run, BaseException):
+            db.end_run(started_run)
+
+
 async def run_slr(db: PaperDatabase,
                   config: Config,
                   client_factory: ClientFactory,
@@ -24,6 +70,7 @@ async def run_slr(db: PaperDatabase,
                   skip_paper_ranking: bool = False,
                   json_output: str = None,
                   ignore_quota: bool = False,
+                  use_ranking_cache: bool = True,
                   zotero_client: ZoteroClient = None) -> None:
     """
     Perform a full literature search
@@ -36,26 +83,16 @@ async def run_slr(db: PaperDatabase,
     :param skip_paper_ranking: Skip ranking the most relevant papers using an LLM after snowballing (Default: False)
     :param json_output: Path to save results to instead of printing to stdout (Default: None)
     :param ignore_quota: Skip fetching more papers to process if did not meet round quota round (Default: False)
+    :param use_ranking_cache: Reuse and save rankings in the persistent ranking cache (Default: True)
     :param zotero_client: Client to use to upload resulting papers to zotero (Default: None)
     """
     # init clients
     openalex_client = client_factory.create_openalex_client()
     grobid_worker = client_factory.create_grobid_worker()
 
-    # init run
-    db.load_embedding_model()  # preempt model load
     slt_timer = Timer()
     loggy.info("Beginning automatic strategic literature review")
-    run_id = db.start_run()
-
-    # generate query if none provided
-    if oa_query:
-        loggy.info(f"Using provided OpenAlex | {oa_query}")
-        db.insert_openalex_query(run_id, None, nl_query, oa_query)
-    else:
-        oa_query_model = client_factory.create_query_generation_client()
-        oa_query = await openalex_client.generate_openalex_query(oa_query_model, nl_query)
-        db.insert_openalex_query(run_id, oa_query_model.model, nl_query, oa_query)
+    run_id, oa_query = await _start_run(db, client_factory, openalex_client, nl_query, oa_query)
 
     # fetch openalex metadata from papers found by the query
     hits = await openalex_client.search_and_save_metadata(run_id, db, oa_query)
@@ -109,7 +146,7 @@ async def run_slr(db: PaperDatabase,
         return
 
     # rank and print output
-    ranker = AbstractRanker(client_factory.create_rank_client(), config.ranking.tokens_per_word)
+    ranker = client_factory.create_abstract_ranker(use_cache=use_ranking_cache)
     ranked_papers = await ranker.rank_paper_abstracts(nl_query, papers)
 
     if json_output:
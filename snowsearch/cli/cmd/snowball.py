@@ -6,7 +6,8 @@ Description: Perform rounds of snowballing from the cli
 @author Derek Garcia
 """
 
-from typing import List, Tuple
+import asyncio
+from typing import List, Tuple, Set
 
 import loggy
 from loggy import Timer
@@ -42,22 +43,33 @@ async def snowball(db: PaperDatabase, openalex_client: OpenAlexClient, grobid_wo
     :return: Number of new papers processed and citation metadata found successfully
     """
 
-    def __get_papers_for_round(num_papers: int) -> List[PaperDTO]:
+    # papers already handed out this run, skipped so papers that failed without a status are not refetched
+    attempted_ids = {p.id for p in seed_papers}
+
+    def __get_papers_for_round(num_papers: int, exclude_ids: Set[str] = None) -> List[PaperDTO]:
         """
         Util method to fetch relevant papers for the round
 
         :param num_papers: Number of papers to fetch
+        :param exclude_ids: Ids of additional papers to skip, ie citations found this round (Default: None)
         :return: List of papers
         """
-        # sort by best match
+        skip_ids = attempted_ids | exclude_ids if exclude_ids else attempted_ids
+        # sort by best match, skip the vector search if nothing is left to process
         if nl_query:
-            return db.search_papers_by_nl_query(nl_query,
-                                                unprocessed=True,
-                                                only_open_access=True,
-                                                paper_limit=num_papers,
-                                                min_score=min_similarity_score)
-        # else get unprocessed papers
-        return db.get_unprocessed_papers(num_papers)
+            if not db.has_unprocessed_papers(only_open_access=True, exclude_ids=skip_ids):
+                return []
+            papers = db.search_papers_by_nl_query(nl_query,
+                                                  unprocessed=True,
+                                                  only_open_access=True,
+                                                  paper_limit=num_papers,
+                                                  min_score=min_similarity_score,
+                                                  exclude_ids=skip_ids)
+        else:
+            # else get unprocessed papers
+            papers = db.get_unprocessed_papers(num_papers, exclude_ids=skip_ids)
+        attempted_ids.update(p.id for p in papers)
+        return papers
 
     # perform n rounds of snowballing
     processed_papers = 0
@@ -76,42 +88,53 @@ async def snowball(db: PaperDatabase, openalex_client: OpenAlexClient, grobid_wo
 
         # process until reach round quota if not lazy
         remaining_quota = round_quota
-        all_round_papers = []
-
-        while True:
-            # cache titles
-            all_round_papers.extend([p.id for p in round_papers])
-            # enrich papers
-            n_success = await grobid_worker.enrich_papers(db, round_papers)
-            # update metadata
-            processed_papers += n_success
-            remaining_quota -= n_success
-            # break if not retrying
-            if ignore_quota:
-                if remaining_quota:
-                    loggy.info("Lazy snowball -- ignoring round quota")
-                break
-            # quota met or (first round and seed provided)
-            if remaining_quota <= 0 or (not r and seed_provided):
-                # don't use other papers for seed if user provided the seed
-                break
-
-            # else get a new batch to attempt to meet the quota
-            loggy.warn(f"Did not meet round quota, processing {remaining_quota} additional papers")
-            round_papers = __get_papers_for_round(remaining_quota)
-
-            # exit early if no papers to snowball with
-            if not round_papers:
-                loggy.warn("Did not find more valid papers to meet quota; exiting early")
-                break
-
-        # fetch metadata for new citations
-        citations = set()
-        for p in all_round_papers:
-            citations.update(db.get_citations(p, True))
-
-        # todo - config to skip title search
-        new_citations += await openalex_client.fetch_and_save_paper_metadata(db, list(citations))
+        # citations queued for metadata fetching this round
+        queued_citations = set()
+        metadata_tasks = []
+
+        try:
+            while True:
+                # enrich papers
+                n_success = await grobid_worker.enrich_papers(db, round_papers)
+                # update metadata
+                processed_papers += n_success
+                remaining_quota -= n_success
+                # fetch metadata for new citations in the background while any remaining papers are processed
+                citations = set(db.get_citations_batch([p.id for p in round_papers], True))
+                citations -= queued_citations
+                queued_citations.update(citations)
+                if citations:
+                    # todo - config to skip title search
+                    metadata_tasks.append(
+                        asyncio.create_task(openalex_client.fetch_and_save_paper_metadata(db, list(citations))))
+                # break if not retrying
+                if ignore_quota:
+                    if remaining_quota:
+                        loggy.info("Lazy snowball -- ignoring round quota")
+                    break
+                # quota met or (first round and seed provided)
+                if remaining_quota <= 0 or (not r and seed_provided):
+                    # don't use other papers for seed if user provided the seed
+                    break
+
+                # else get a new batch to attempt to meet the quota
+                loggy.warn(f"Did not meet round quota, processing {remaining_quota} additional papers")
+                # skip citations found this round, their metadata may still be loading so selecting them would
+                # depend on timing
+                round_papers = __get_papers_for_round(remaining_quota, {c.id for c in queued_citations})
+
+                # exit early if no papers to snowball with
+                if not round_papers:
+                    loggy.warn("Did not find more valid papers to meet quota; exiting early")
+                    break
+
+            # wait for all citation metadata to be saved before next round
+            new_citations += sum(await asyncio.gather(*metadata_tasks))
+        finally:
+            # don't leave metadata fetches running if the round failed
+            for task in metadata_tasks:
+                task.cancel()
+            await asyncio.gather(*metadata_tasks, return_exceptions=True)
 
         # Repeat
         loggy.info(f"Snowball Round {r + 1} completed in {timer.format_time()}s")
@@ -145,8 +168,10 @@ async def run_snowball(db: PaperDatabase,
     if seed_paper_titles:
         loggy.debug_info("Using provided papers for seed")
         seed_papers = db.get_papers(seed_paper_titles)
-        for missing_title in validate_all_papers_found(seed_paper_titles, seed_papers):
-            loggy.warn(f"Could not find seed paper '{missing_title}' in the database")
+        # report all missing papers at once
+        if missing_titles := validate_all_papers_found(seed_paper_titles, seed_papers):
+            loggy.warn(f"Could not find {len(missing_titles)} seed paper(s) in the database: "
+                       f"{', '.join(repr(t) for t in missing_titles)}")
 
     elif nl_query:
         loggy.debug_info("Using best query match for seed")
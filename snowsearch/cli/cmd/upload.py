@@ -6,7 +6,9 @@ Description: Upload local pdf papers to be stored in the database
 @author Derek Garcia
 """
 
-from typing import List
+import asyncio
+import hashlib
+from typing import List, Tuple
 
 import loggy
 from loggy import Timer
@@ -19,6 +21,38 @@ from grobid.worker import GrobidWorker
 from openalex.client import OpenAlexClient
 from util.verify import validate_file_is_pdf
 
+CITATION_FLUSH_SIZE = 10_000  # max citations to hold before writing to the database
+
+
+def _get_pdf_hash(file_path: str) -> str | None:
+    """
+    Hash the contents of a pdf to detect duplicate uploads
+
+    :param file_path: Path to the file to hash
+    :return: Hex digest of the file, None if the file is not a pdf
+    """
+    if not validate_file_is_pdf(file_path):
+        return None
+    with open(file_path, 'rb') as f:
+        return hashlib.file_digest(f, hashlib.blake2b).hexdigest()
+
+
+def _flush_pending(db: PaperDatabase, pending_citations: List[Tuple[str, PaperDTO]],
+                   pending_failures: List[PaperDTO]) -> None:
+    """
+    Write pending citations and failed papers to the database in bulk and clear them
+
+    :param db: Database to store paper results in
+    :param pending_citations: List of source paper title and the paper it cites
+    :param pending_failures: List of papers that failed to process
+    """
+    if pending_citations:
+        db.insert_citation_paper_bulk(pending_citations)
+        pending_citations.clear()
+    if pending_failures:
+        db.insert_paper_batch(pending_failures)
+        pending_failures.clear()
+
 
 async def run_upload(db: PaperDatabase,
                      openalex_client: OpenAlexClient,
@@ -32,13 +66,19 @@ async def run_upload(db: PaperDatabase,
     :param grobid_worker: Client to make requests to Grobid server
     :param paper_pdf_paths: List of paths to pdfs to upload
     """
-    # verify files
+    # verify and hash files, checks are independent so read them in parallel
+    pdf_hashes = await asyncio.gather(*(asyncio.to_thread(_get_pdf_hash, p) for p in paper_pdf_paths))
     valid_paper_files = []
-    for p in paper_pdf_paths:
-        if not validate_file_is_pdf(p):
+    seen_hashes = set()
+    for p, pdf_hash in zip(paper_pdf_paths, pdf_hashes):
+        if not pdf_hash:
             loggy.warn(f"'{p}' is not a valid pdf, skipping")
+        # don't send the same pdf to grobid twice
+        elif pdf_hash in seen_hashes:
+            loggy.warn(f"'{p}' is a duplicate of another pdf, skipping")
         else:
             loggy.debug_info(f"'{p}' is a valid pdf")
+            seen_hashes.add(pdf_hash)
             valid_paper_files.append(p)
 
     # error if nothing to process
@@ -52,6 +92,8 @@ async def run_upload(db: PaperDatabase,
 
     timer = Timer()
     papers = []
+    pending_citations: List[Tuple[str, PaperDTO]] = []
+    pending_failures: List[PaperDTO] = []
     num_success = 0
     num_fail_process = 0
 
@@ -62,25 +104,32 @@ async def run_upload(db: PaperDatabase,
             result: GrobidDTO = await future
             result.paper.grobid_status = 200
             papers.append(result.paper)
-            # add referenced papers, if any
-            if result.citations:
-                db.insert_citation_paper_batch(result.paper.id, result.citations)
-
+            # queue referenced papers, if any
+            pending_citations.extend((result.paper.id, c) for c in result.citations)
             num_success += 1
 
         # failed to parse pdf
         except GrobidProcessError as e:
             loggy.error(e)
-            db.upsert_paper(PaperDTO(e.paper_title, grobid_status=e.status_code, grobid_error_msg=e.error_msg))
+            pending_failures.append(
+                PaperDTO(e.paper_title, grobid_status=e.status_code, grobid_error_msg=e.error_msg))
             num_fail_process += 1
 
+        # write in bulk rather than per paper
+        if len(pending_citations) >= CITATION_FLUSH_SIZE:
+            _flush_pending(db, pending_citations, pending_failures)
+
+    # write anything remaining, failed papers are inserted without embeddings so calculate them now
+    has_failures = bool(pending_failures)
+    _flush_pending(db, pending_citations, pending_failures)
+    if has_failures:
+        db.update_missing_title_embeddings()
+
     # fetch paper metadata
     n_metadata_found = await openalex_client.fetch_and_save_paper_metadata(db, papers)
-    # fetch citation metadata
-    citations = set()  # use set to prevent dupe citations
-    for p in papers:
-        citations.update(db.get_citations(p.id, True))
-    n_metadata_found += await openalex_client.fetch_and_save_paper_metadata(db, list(citations))
+    # fetch citation metadata, citations are deduplicated by the query
+    citations = db.get_citations_batch([p.id for p in papers], True)
+    n_metadata_found += await openalex_client.fetch_and_save_paper_metadata(db, citations)
 
     # log stats
     loggy.info(f"Upload complete in {timer.format_time()}s")
@@ -5,106 +5,153 @@ Description: CLI command parser
 @author Derek Garcia
 """
 
-from argparse import ArgumentParser, Namespace
+import sys
+from argparse import ArgumentParser, HelpFormatter, Namespace
+from functools import lru_cache
+from typing import List, Tuple, Dict, Any
 
 from loggy import Level, DEFAULT_LOG_LEVEL
 
 PROG_NAME = "snowsearch"
+# python 3.14+ builds new formatters to validate each added argument
+REUSE_VALIDATION_FORMATTER = sys.version_info >= (3, 14)
+LOG_LEVEL_CHOICES = [level.name for level in Level]
+LOG_LEVEL_HELP = f"Set log level (Default: {DEFAULT_LOG_LEVEL.name}) ({LOG_LEVEL_CHOICES})"
+
+# command descriptions
+SLR_DESC = ("Perform a complete literature search with search generation, "
+            "rounds of snowballing, and final abstract LLM ranking.")
+SNOWBALL_DESC = ("Perform snowballing using papers stored in the database "
+                 "without the initial OpenAlex search or LLM ranking")
+SEARCH_DESC = "Search the database for matching papers"
+INSPECT_DESC = "Get details about a paper"
+RANK_DESC = "Rank papers that best match the provided search"
+UPLOAD_DESC = "Upload papers locally to the database"
+
+
+class _ArgumentParser(ArgumentParser):
+    """
+    Argument parser that reuses a single formatter when validating added arguments
+    """
+
+    def __init__(self, *args, **kwargs):
+        # set before init since the help flag is added there
+        self._validation_formatter: HelpFormatter | None = None
+        self._validating = False
+        super().__init__(*args, **kwargs)
+
+    def _get_formatter(self) -> HelpFormatter:
+        """
+        Get a formatter, reusing the cached one while validating arguments
+
+        :return: Help formatter
+        """
+        if not self._validating:
+            return super()._get_formatter()
+        # validation only reads from the formatter so it is safe to share
+        if self._validation_formatter is None:
+            self._validation_formatter = super()._get_formatter()
+        return self._validation_formatter
+
+    def add_argument(self, *args, **kwargs):
+        """
+        Add an argument, validating with the cached formatter
+        """
+        if not REUSE_VALIDATION_FORMATTER:
+            return super().add_argument(*args, **kwargs)
+        self._validating = True
+        try:
+            return super().add_argument(*args, **kwargs)
+        finally:
+            self._validating = False
 
 
 #
 # Generic Flags
 #
 
-def _add_semantic_search_arg(command, positional: bool = True) -> None:
-    """
-    Add a semantic search to the command
-
-    :param command: Command to add arg to
-    :param positional: Use as positional arg (Default: True)
-    """
-    params = {
-        'metavar': "<semantic-search>",
-        'type': str,
-        'help': "Descriptive, natural language search for desired papers. "
-                "i.e. \"AI-driven optimization of renewable energy systems\""
-    }
-    # set value
-    if positional:
-        command.add_argument('semantic_search', **params)
-    else:
-        command.add_argument('-ss', '--semantic-search', **params)
-
-
-def _add_json_flag_arg(command) -> None:
-    """
-    Add json flag to command
-
-    :param command: Command to add arg to
-    """
-    command.add_argument('-j', '--json',
-                         metavar="<json-file-path>",
-                         type=str,
-                         help="Save the results to json file instead of printing to stdout")
-
-
-def _add_paper_titles_flag_arg(command) -> None:
-    """
-    Add paper titles flag to command
-
-    :param command: Command to add arg to
-    """
-    command.add_argument('-p', '--papers',
-                         metavar="<paper-titles>",
-                         type=str,
-                         nargs="+",
-                         help="One or more paper titles to start with. i.e \"Graph Attention Networks\" \"GINE\"")
-
-
-def _add_paper_titles_input_flag_arg(command) -> None:
-    """
-    Add paper titles input flag to command
-
-    :param command: Command to add arg to
-    """
-    command.add_argument('-i', '--papers-input',
-                         metavar="<csv-file-path>",
-                         type=str,
-                         help="Path to csv file with list of paper titles to start with")
-
-
-def _add_limit_flag_arg(command) -> None:
-    """
-    Add limit flag to command
-
-    """
-    command.add_argument('-l', '--limit',
-                         metavar="<limit>",
-                         type=int,
-                         help="Limit the number of papers to return")
-
-
-def _add_min_similarity_score_flag_arg(command) -> None:
-    """
-    Add min similarity score flag to command
-
-    :param command: Command to add arg to
-    """
-    command.add_argument('-m', '--min-similarity-score',
-                         metavar="<score>",
-                         type=float,
-                         help="Score between -1 and 1 to be the minimum similarity match to filter for")
-
-
-def _add_ignore_quota_process_flag_arg(command) -> None:
-    """
-    Add ignore_quota flag to command
-
-    :param command: Command to add arg to
-    """
-    command.add_argument('--ignore-quota',
-                         action="store_true",
-                         help="Do not retry to process additional papers to meet the round paper quota")
+# flag specs shared between commands: (flags, add_argument kwargs)
+_SEMANTIC_SEARCH_PARAMS = {
+    'metavar': "<semantic-search>",
+    'type': str,
+    'help': "Descriptive, natural language search for desired papers. "
+            "i.e. \"AI-driven optimization of renewable energy systems\""
+}
+SEMANTIC_SEARCH_ARG = (('semantic_search',), _SEMANTIC_SEARCH_PARAMS)
+SEMANTIC_SEARCH_FLAG = (('-ss', '--semantic-search'), _SEMANTIC_SEARCH_PARAMS)
+
+JSON_FLAG = (('-j', '--json'), {
+    'metavar': "<json-file-path>",
+    'type': str,
+    'help': "Save the results to json file instead of printing to stdout"
+})
+
+PAPER_TITLES_FLAG = (('-p', '--papers'), {
+    'metavar': "<paper-titles>",
+    'type': str,
+    'nargs': "+",
+    'help': "One or more paper titles to start with. i.e \"Graph Attention Networks\" \"GINE\""
+})
+
+PAPER_TITLES_INPUT_FLAG = (('-i', '--papers-input'), {
+    'metavar': "<csv-file-path>",
+    'type': str,
+    'help': "Path to csv file with list of paper titles to start with"
+})
+
+LIMIT_FLAG = (('-l', '--limit'), {
+    'metavar': "<limit>",
+    'type': int,
+    'help': "Limit the number of papers to return"
+})
+
+MIN_SIMILARITY_SCORE_FLAG = (('-m', '--min-similarity-score'), {
+    'metavar': "<score>",
+    'type': float,
+    'help': "Score between -1 and 1 to be the minimum similarity match to filter for"
+})
+
+IGNORE_QUOTA_FLAG = (('--ignore-quota',), {
+    'action': "store_true",
+    'help': "Do not retry to process additional papers to meet the round paper quota"
+})
+
+NO_CACHE_FLAG = (('--no-cache',), {
+    'action': "store_true",
+    'help': "Do not read or save cached abstract rankings, ie to force re-ranking after a model or prompt change"
+})
+
+ZOTERO_USER_LIBRARY_FLAG = (('-zu', '--zotero-user-library'), {
+    'metavar': "<zotero-id>",
+    'type': str,
+    'help': "Upload to personal Zotero library. "
+            "The User ID can be found here: https://www.zotero.org/settings/keys"
+})
+
+ZOTERO_GROUP_LIBRARY_FLAG = (('-zg', '--zotero-group-library'), {
+    'metavar': "<group-id>",
+    'type': str,
+    'help': "Upload to a group Zotero library. "
+            "The library must be private and user must have write access"
+})
+
+ZOTERO_COLLECTION_FLAG = (('-zc', '--zotero-collection'), {
+    'metavar': "<collection-id>",
+    'type': str,
+    'nargs': '?',
+    'help': "Collection ID to a specific collection"
+})
+
+
+def _add_args(command, *specs: Tuple[Tuple[str, ...], Dict[str, Any]]) -> None:
+    """
+    Add each flag spec to the command
+
+    :param command: Command to add args to
+    :param specs: Flag specs to add
+    """
+    for flags, params in specs:
+        command.add_argument(*flags, **params)
 
 
 def _add_zotero_flag_args(command) -> None:
@@ -113,24 +160,8 @@ def _add_zotero_flag_args(command) -> None:
 
     :param command: Command to add arg to
     """
-    lib_group = command.add_mutually_exclusive_group()
-    lib_group.add_argument('-zu', '--zotero-user-library',
-                           metavar="<zotero-id>",
-                           type=str,
-                           help="Upload to personal Zotero library. "
-                                "The User ID can be found here: https://www.zotero.org/settings/keys")
-
-    lib_group.add_argument('-zg', '--zotero-group-library',
-                           metavar="<group-id>",
-                           type=str,
-                           help="Upload to a group Zotero library. "
-                                "The library must be private and user must have write access")
-
-    command.add_argument('-zc', '--zotero-collection',
-                         metavar="<collection-id>",
-                         type=str,
-                         nargs='?',
-                         help="Collection ID to a specific collection")
+    _add_args(command.add_mutually_exclusive_group(), ZOTERO_USER_LIBRARY_FLAG, ZOTERO_GROUP_LIBRARY_FLAG)
+    _add_args(command, ZOTERO_COLLECTION_FLAG)
 
 
 #
@@ -146,10 +177,24 @@ def _validate_zotero_args(parser: ArgumentParser, args: Namespace) -> None:
     :raises ParseError: If all required flags are not present
     """
     # Custom validation: Ensure that collection not used with group
-    if args.zotero_group_library and args.zotero_collection:
+    # not all commands have zotero args
+    if getattr(args, 'zotero_group_library', None) and getattr(args, 'zotero_collection', None):
         parser.error("The argument --zotero-collection (-zc) cannot be used with --zotero-group-library (-zg)")
 
 
+def _validate_slr_args(parser: ArgumentParser, args: Namespace) -> None:
+    """
+    Validate the usage of the slr args
+
+    :param parser: Parser used to parse cli args
+    :param args: Args to verify
+    :raises ParseError: If json output is used with skip ranking
+    """
+    # exclusive since can't write to json if skip ranking
+    if args.command == 'slr' and args.json and args.skip_ranking:
+        parser.error("The argument --json (-j) cannot be used with --skip-ranking")
+
+
 #
 # Commands
 #
@@ -160,12 +205,9 @@ def _add_slr_command(root_command) -> None:
 
     :param root_command: Command to add arg to
     """
-    desc = ("Perform a complete literature search with search generation, "
-            "rounds of snowballing, and final abstract LLM ranking.")
-    slr = root_command.add_parser('slr', description=desc, help=desc)
+    slr = root_command.add_parser('slr', description=SLR_DESC, help=SLR_DESC)
     # add generic args
-    _add_semantic_search_arg(slr)
-    _add_ignore_quota_process_flag_arg(slr)
+    _add_args(slr, SEMANTIC_SEARCH_ARG, IGNORE_QUOTA_FLAG, NO_CACHE_FLAG)
     _add_zotero_flag_args(slr)
 
     # add unique args
@@ -176,13 +218,12 @@ def _add_slr_command(root_command) -> None:
                           "See https://docs.openalex.org/how-to-use-the-api/get-lists-of-entities/search-entities#boolean-searches "
                           "for formatting rules")  # skip llm generation step
 
-    slr_group = slr.add_mutually_exclusive_group()
-    _add_json_flag_arg(slr_group)
-    # exclusive since can't write to json if skip ranking
-    slr_group.add_argument('--skip-ranking',
-                           action="store_true",
-                           help="Skip the final paper ranking using an LLM",
-                           default=False)
+    # exclusive with json, checked after parsing
+    _add_args(slr, JSON_FLAG)
+    slr.add_argument('--skip-ranking',
+                     action="store_true",
+                     help="Skip the final paper ranking using an LLM",
+                     default=False)
 
 
 def _add_snowball_command(root_command) -> None:
@@ -191,20 +232,16 @@ def _add_snowball_command(root_command) -> None:
 
     :param root_command: Command to add arg to
     """
-    desc = "Perform snowballing using papers stored in the database without the initial OpenAlex search or LLM ranking"
-    snowball = root_command.add_parser('snowball', description=desc, help=desc)
+    snowball = root_command.add_parser('snowball', description=SNOWBALL_DESC, help=SNOWBALL_DESC)
     # add generic args
-    _add_semantic_search_arg(snowball, False)
-    _add_ignore_quota_process_flag_arg(snowball)
+    _add_args(snowball, SEMANTIC_SEARCH_FLAG, IGNORE_QUOTA_FLAG)
 
     # add unique args
     snowball.add_argument('--no-limit',
                           action="store_true",
                           help="Set no citation cap and process all new unprocessed papers")
 
-    snowball_group = snowball.add_mutually_exclusive_group()
-    _add_paper_titles_flag_arg(snowball_group)
-    _add_paper_titles_input_flag_arg(snowball_group)
+    _add_args(snowball.add_mutually_exclusive_group(), PAPER_TITLES_FLAG, PAPER_TITLES_INPUT_FLAG)
 
 
 def _add_search_command(root_command) -> None:
@@ -213,14 +250,11 @@ def _add_search_command(root_command) -> None:
 
     :param root_command: Command to add arg to
     """
-    desc = "Search the database for matching papers"
-    search = root_command.add_parser('search', description=desc, help=desc)
+    search = root_command.add_parser('search', description=SEARCH_DESC, help=SEARCH_DESC)
+    search.set_defaults(needs_config=False)  # only reads from the database
 
     # add generic args
-    _add_semantic_search_arg(search)
-    _add_limit_flag_arg(search)
-    _add_min_similarity_score_flag_arg(search)
-    _add_json_flag_arg(search)
+    _add_args(search, SEMANTIC_SEARCH_ARG, LIMIT_FLAG, MIN_SIMILARITY_SCORE_FLAG, JSON_FLAG)
     _add_zotero_flag_args(search)
 
     # add unique args
@@ -247,8 +281,8 @@ def _add_inspect_command(root_command) -> None:
 
     :param root_command: Command to add arg to
     """
-    desc = "Get details about a paper"
-    inspect = root_command.add_parser('inspect', description=desc, help=desc)
+    inspect = root_command.add_parser('inspect', description=INSPECT_DESC, help=INSPECT_DESC)
+    inspect.set_defaults(needs_config=False)  # only reads from the database
     inspect.add_argument('paper_title',
                          metavar="<title-of-paper>",
                          type=str,
@@ -261,18 +295,11 @@ def _add_rank_command(root_command) -> None:
 
     :param root_command: Command to add arg to
     """
-    desc = "Rank papers that best match the provided search"
-    rank = root_command.add_parser('rank', description=desc, help=desc)
+    rank = root_command.add_parser('rank', description=RANK_DESC, help=RANK_DESC)
     # add generic args
-    _add_semantic_search_arg(rank)
-    _add_limit_flag_arg(rank)
-    _add_min_similarity_score_flag_arg(rank)
-    _add_json_flag_arg(rank)
+    _add_args(rank, SEMANTIC_SEARCH_ARG, LIMIT_FLAG, MIN_SIMILARITY_SCORE_FLAG, JSON_FLAG, NO_CACHE_FLAG)
     _add_zotero_flag_args(rank)
-
-    rank_group = rank.add_mutually_exclusive_group()
-    _add_paper_titles_flag_arg(rank_group)
-    _add_paper_titles_input_flag_arg(rank_group)
+    _add_args(rank.add_mutually_exclusive_group(), PAPER_TITLES_FLAG, PAPER_TITLES_INPUT_FLAG)
 
 
 def _add_upload_command(root_command) -> None:
@@ -281,8 +308,7 @@ def _add_upload_command(root_command) -> None:
 
     :param root_command: Command to add arg to
     """
-    desc = "Upload papers locally to the database"
-    upload = root_command.add_parser('upload', description=desc, help=desc)
+    upload = root_command.add_parser('upload', description=UPLOAD_DESC, help=UPLOAD_DESC)
 
     upload_group = upload.add_mutually_exclusive_group(required=True)
     upload_group.add_argument('-f', '--file',
@@ -295,13 +321,56 @@ def _add_upload_command(root_command) -> None:
                               help="Path to root directory of pdf files to upload")
 
 
-def parse_arguments() -> Namespace:
+# commands in the order they are listed in the help menu
+_COMMANDS = {
+    'slr': _add_slr_command,  # slr command - main toolchain
+    'snowball': _add_snowball_command,  # snowball command - perform snowballing without openalex search or llm ranking
+    'search': _add_search_command,  # search command - search papers in the database
+    'inspect': _add_inspect_command,  # inspect command - show details about a paper in the database
+    'rank': _add_rank_command,  # rank command - use llm to rank papers
+    'upload': _add_upload_command  # upload command - upload local pdfs to the database
+}
+
+
+# global flags that take a value before the command
+_VALUE_FLAGS = ('-c', '--config', '-l', '--log-level')
+_HELP_FLAGS = ('-h', '--help')
+
+
+def _sniff_command(argv: List[str]) -> str | None:
+    """
+    Find the command being invoked without parsing the arguments
+
+    :param argv: Raw cli arguments
+    :return: Name of the invoked command, None if not found or top level help is requested
     """
-    Create the Arg parser
+    skip_next = False
+    for token in argv:
+        # skip the value of a global flag
+        if skip_next:
+            skip_next = False
+            continue
+        if token in _VALUE_FLAGS:
+            skip_next = True
+            continue
+        # top level help lists every command
+        if token in _HELP_FLAGS:
+            return None
+        if token in _COMMANDS:
+            return token
+    return None
+
 
+@lru_cache(maxsize=None)
+def _create_parser(invoked_command: str | None) -> ArgumentParser:
+    """
+    Create the Arg parser, only built once per invoked command
+
+    :param invoked_command: Name of the command to build, None to build all commands
     :return: Arg parser
     """
-    parser = ArgumentParser(
+    # subparsers inherit the parser class
+    parser = _ArgumentParser(
         description="SnowSearch: AI-powered snowball systemic literature review assistant",
         prog=PROG_NAME
     )
@@ -314,12 +383,11 @@ def parse_arguments() -> Namespace:
 
     # logging flags
     logging = parser.add_argument_group("Logging")
-    level_choices = [level.name for level in Level]
     logging.add_argument(
         "-l", "--log-level",
         metavar="<log level>",
-        choices=level_choices,
-        help=f"Set log level (Default: {DEFAULT_LOG_LEVEL.name}) ({level_choices})",
+        choices=LOG_LEVEL_CHOICES,
+        help=LOG_LEVEL_HELP,
         default=DEFAULT_LOG_LEVEL.name
     )
     logging.add_argument("-s", "--silent",
@@ -329,16 +397,27 @@ def parse_arguments() -> Namespace:
     # Create subparsers for different commands
     commands = parser.add_subparsers(dest='command', required=True)
 
-    _add_slr_command(commands)  # slr command - main toolchain
-    _add_snowball_command(commands)  # snowball command - perform snowballing without openalex search or llm ranking
-    _add_search_command(commands)  # search command - search papers in the database
-    _add_inspect_command(commands)  # inspect command - show details about a paper in the database
-    _add_rank_command(commands)  # rank command - use llm to rank papers
-    _add_upload_command(commands)  # upload command - upload local pdfs to the database
+    # only build the invoked command, the rest are name only stubs
+    for name, add_command in _COMMANDS.items():
+        if invoked_command in (None, name):
+            add_command(commands)
+        else:
+            commands.add_parser(name, add_help=False)
+
+    return parser
+
 
+def parse_arguments() -> Namespace:
+    """
+    Parse the cli arguments
+
+    :return: Parsed args
+    """
+    parser = _create_parser(_sniff_command(sys.argv[1:]))
     args = parser.parse_args()
     # custom validation
     _validate_zotero_args(parser, args)
+    _validate_slr_args(parser, args)
 
     # args ok
     return args
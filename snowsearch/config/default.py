@@ -10,6 +10,7 @@ from dataclasses import dataclass
 
 from download.config import MAX_PDF_COUNT
 from grobid.config import MAX_GROBID_REQUESTS, MAX_CONCURRENT_DOWNLOADS
+from openalex.config import MAX_CONCURRENT_REQUESTS
 from rank.config import AVG_TOKEN_PER_WORD
 
 
@@ -56,6 +57,14 @@ class AbstractRankingDefaults:
     TOP_N_PAPERS = 10
 
 
+@dataclass(frozen=True)
+class OpenAlexDefaults:
+    """
+    Defaults for OpenAlex
+    """
+    MAX_CONCURRENT_REQUESTS = MAX_CONCURRENT_REQUESTS
+
+
 @dataclass(frozen=True)
 class GrobidDefaults:
     """
@@ -6,18 +6,32 @@ Description: Load config yaml file into series of DTOs
 @author Derek Garcia
 """
 
+import copy
+import hashlib
+import json
 import os
 from dataclasses import dataclass
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
 import loggy
 import yaml
 
-from config.default import AgentDefaults, AbstractRankingDefaults, GrobidDefaults, SnowballDefaults
+from config.default import AgentDefaults, AbstractRankingDefaults, GrobidDefaults, SnowballDefaults, \
+    OpenAlexDefaults
 from download.config import MAX_PDF_COUNT
 from grobid.config import MAX_CONCURRENT_DOWNLOADS
 
+# use libyaml bindings if available
+try:
+    from yaml import CSafeLoader as _YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as _YAMLLoader
+
 DEFAULT_CONFIG_PATH = "config.yaml"
+CONFIG_CACHE_DIR = ".cache/snowsearch"
+
+# in-process cache of parsed config files
+_LOADED_CONFIGS: Dict[Tuple[str, int], Dict[str, Any]] = {}
 
 
 @dataclass
@@ -75,13 +89,20 @@ class OpenAlexConfigDTO:
     Config for OpenAlex
     """
     email: str | None = None
+    max_concurrent_requests: int = OpenAlexDefaults.MAX_CONCURRENT_REQUESTS
 
     def __post_init__(self):
         """
-        Assign env or defaults to values if not set in config
+        Assign env or defaults to values if not set in config and validate
+
+        :raises ValueError: If config is invalid
         """
         self.email = self.email or os.getenv('SS_OA_EMAIL')
 
+        # check requests
+        if self.max_concurrent_requests < 1:
+            raise ValueError("Must make at least one request to OpenAlex")
+
 
 @dataclass
 class GrobidConfigDTO:
@@ -147,6 +168,48 @@ class SnowballConfigDTO:
             raise ValueError("Each snowball round needs at least 1 paper")
 
 
+def _load_config(config_file: str) -> Dict[str, Any]:
+    """
+    Load a config file, using a cached copy if the file has not changed since it was last parsed
+
+    :param config_file: Path to config file to load
+    :return: Parsed config, a copy that is safe to modify
+    """
+    # key cache file by path, but validate with the modified time
+    config_path = os.path.abspath(config_file)
+    mtime = os.stat(config_path).st_mtime_ns
+    key = (config_path, mtime)
+    # check if already loaded this run
+    if key in _LOADED_CONFIGS:
+        return copy.deepcopy(_LOADED_CONFIGS[key])
+    path_hash = hashlib.md5(config_path.encode()).hexdigest()
+    cache_file = os.path.join(os.path.expanduser(f"~/{CONFIG_CACHE_DIR}"), f"conf-{path_hash}.json")
+    # check for cache hit, json so reading the cache can't execute code
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as file:
+            cached = json.load(file)
+        if cached['mtime'] == mtime:
+            loggy.debug_info(f"Using cached config '{cache_file}'")
+            _LOADED_CONFIGS[key] = cached['config']
+            return copy.deepcopy(cached['config'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # missing or corrupt cache, parse the file instead
+
+    with open(config_path, 'r', encoding='utf-8') as file:
+        config = yaml.load(file, Loader=_YAMLLoader)
+    _LOADED_CONFIGS[key] = config
+    # cache for next run, only if json preserves the config exactly, failing to cache is non-fatal
+    try:
+        cache_data = json.dumps({'mtime': mtime, 'config': config})
+        if json.loads(cache_data)['config'] == config:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, 'w', encoding='utf-8') as file:
+                file.write(cache_data)
+    except (OSError, TypeError, ValueError) as e:
+        loggy.debug_warn(f"Failed to cache config: {e}")
+    return copy.deepcopy(config)
+
+
 class Config:
     """
     Master config with details of all configs
@@ -156,10 +219,21 @@ class Config:
         """
         Create new config
 
-        :param config_file: Optional config file to read from (Default: None)
+        :param config_file: Optional config file to read from, if not provided the default config file is used
+        if it exists, else the defaults (Default: None)
+        :raises FileNotFoundError: If the provided config file does not exist
         """
+        config = None
+        try:
+            config = _load_config(config_file or DEFAULT_CONFIG_PATH)
+            loggy.info(f"Loaded config details from '{config_file or DEFAULT_CONFIG_PATH}'")
+        except FileNotFoundError:
+            # only a missing default config is allowed, an explicitly provided file must exist
+            if config_file:
+                raise
+
         # use env + defaults if no config to use
-        if not config_file:
+        if not config:
             loggy.debug_info("Using default configuration")
             agent_config = AgentConfigDTO()
             self._snowball = SnowballConfigDTO()
@@ -169,11 +243,6 @@ class Config:
             self._grobid = GrobidConfigDTO()
             return
 
-        # load config file if provided
-        loggy.info(f"Loading config details from '{config_file}'")
-        with open(config_file, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
-
         # get config overrides lambda
         def __get_params(c: Dict[str, Any], keys: List[str]) -> Dict[str, Any]:
             """
@@ -201,7 +270,8 @@ class Config:
                                       ['tokens_per_word', 'min_abstract_score', 'top_n_papers'])
         self._ranking = RankingConfigDTO(agent_config=agent_config, **ranking_params)
         # openalex
-        self._openalex = OpenAlexConfigDTO(**__get_params(config.get('openalex', []), ['email']))
+        self._openalex = OpenAlexConfigDTO(**__get_params(config.get('openalex', []),
+                                                          ['email', 'max_concurrent_requests']))
         # grobid
         grobid_params = __get_params(config.get('grobid', []),
                                      ['max_grobid_requests', 'max_concurrent_downloads', 'max_local_pdfs'])
@@ -11,7 +11,7 @@ import time
 from abc import ABC
 
 import loggy
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, Driver
 from neo4j.exceptions import ConstraintError, TransientError
 
 from db import _NODE_SCHEMA
@@ -43,6 +43,7 @@ class Neo4jDatabase(ABC):
         """
         self._uri = f"{os.getenv('BOLT_URI', DEFAULT_BOLT_URI)}:{os.getenv('BOLT_PORT', DEFAULT_BOLT_PORT)}"
         self._driver = None
+        self._is_open = False
 
     def _verify_connection(self) -> None:
         """
@@ -62,29 +63,63 @@ class Neo4jDatabase(ABC):
             raise ConnectionError(e) from e
         loggy.debug_info("Connected Successfully")
 
-    def __enter__(self) -> "Neo4jDatabase":
+    def _connect(self) -> None:
         """
-        Open database connection
+        Create the driver and verify the connection to the database
 
-        :return: Neo4jDatabase with open connection
+        :raises ConnectionError: If failed to connect to the Neo4j database
         """
         username, password = os.getenv('NEO4J_AUTH').split('/', 1)
         self._driver = GraphDatabase.driver(
             self._uri,
             auth=(username, password)
         )
-        self._verify_connection()
+        try:
+            self._verify_connection()
+            self._on_connect()
+        except Exception:
+            # reset so the next use retries the connection
+            self._driver.close()
+            self._driver = None
+            raise
 
+    def _on_connect(self) -> None:
+        """
+        Hook run once after the connection to the database is first established
+        """
+
+    def _get_driver(self) -> Driver:
+        """
+        Get the database driver, connecting on first use
+
+        :raises RuntimeError: If attempt to use the database outside the context manager
+        :return: Database driver
+        """
+        if not self._is_open:
+            raise RuntimeError("Database driver is not initialized")
+        # lazy connect
+        if not self._driver:
+            self._connect()
+        return self._driver
+
+    def __enter__(self) -> "Neo4jDatabase":
+        """
+        Open database, the connection is established on first use
+
+        :return: Neo4jDatabase that can be connected to
+        """
+        self._is_open = True
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
         """
-        Close database connection
+        Close database connection if one was made
 
         :param exc_type:
         :param exc_val:
         :param exc_tb:
         """
+        self._is_open = False
         if self._driver:
             self._driver.close()
             self._driver = None
@@ -94,7 +129,7 @@ class Neo4jDatabase(ABC):
         Load constraints from the schema yaml file
         """
         loggy.debug_info("Initializing database")
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             # enforce for unique keys
             for node_label in _NODE_SCHEMA.keys():
                 # Create the constraint query dynamically
@@ -110,13 +145,10 @@ class Neo4jDatabase(ABC):
         :raises RuntimeError: If attempt to insert using a closed connection
         :return: True if node exists, False otherwise
         """
-        # ensure open connection
-        if not self._driver:
-            raise RuntimeError("Database driver is not initialized")
         # build query
         query = f"MATCH (n:{node_type.value}) WHERE n.id = $node_id RETURN count(n) > 0 AS exists"
         # exe and return results
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             result = session.run(query, node_id=node_id)
             return result.single()["exists"]
 
@@ -130,10 +162,6 @@ class Neo4jDatabase(ABC):
         :raises RuntimeError: If attempt to insert using a closed connection
         :return True if inserted or updated, False if not
         """
-        # ensure open connection
-        if not self._driver:
-            raise RuntimeError("Database driver is not initialized")
-
         # always use match id
         query = f"{'MERGE' if update else 'CREATE'} (n:{node.type.value} {{match_id: '{node.match_id}'}})"
 
@@ -158,7 +186,7 @@ class Neo4jDatabase(ABC):
         # execute query
         for attempt in range(MAX_ATTEMPTS):
             try:
-                with self._driver.session() as session:
+                with self._get_driver().session() as session:
                     session.run(query, parameters={**node.required_properties, **node.properties})
                 return True
             except ConstraintError:
@@ -180,9 +208,6 @@ class Neo4jDatabase(ABC):
         :param end_node: End node
         :raises RuntimeError: If attempt to insert using a closed connection
         """
-        # ensure open connection
-        if not self._driver:
-            raise RuntimeError("Database driver is not initialized")
 
         # ensure nodes exist
         self.insert_node(start_node)
@@ -213,5 +238,5 @@ class Neo4jDatabase(ABC):
         }
 
         # execute query
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             session.run(query, parameters)
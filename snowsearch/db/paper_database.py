@@ -10,11 +10,10 @@ import logging
 import os
 from dataclasses import asdict
 from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Collection
 
 import loggy
 from loggy import Timer
-from neo4j import GraphDatabase
 
 from db.config import DEFAULT_EMBEDDING_MODEL, DEFAULT_DIMENSIONS, SENTENCE_TRANSFORMER_CACHE, DOI_PREFIX
 from db.database import Neo4jDatabase
@@ -44,8 +43,13 @@ class PaperDatabase(Neo4jDatabase):
         self._model_dimensions = model_dimensions
         self._embedding_model_name = embedding_model_name
         self._embedding_model = None
+        # the same query is searched many times per command, ie every snowball round
+        self._query_embeddings: Dict[str, List[float]] = {}
 
-        # create embedding index for title and abstract
+    def _on_connect(self) -> None:
+        """
+        Create the title and abstract embedding indexes once connected
+        """
         queries = [
             f"""
             CREATE VECTOR INDEX paper_title_index IF NOT EXISTS
@@ -68,19 +72,16 @@ class PaperDatabase(Neo4jDatabase):
             }}
             """
         ]
-        # exec with tmp driver
-        username, password = os.getenv('NEO4J_AUTH').split('/', 1)
-        tmp_driver = GraphDatabase.driver(self._uri, auth=(username, password))
-        try:
-            with tmp_driver.session() as session:
-                for q in queries:
-                    session.run(q)
-        finally:
-            tmp_driver.close()
-
-    def load_embedding_model(self) -> None:
+        with self._driver.session() as session:
+            for q in queries:
+                session.run(q)
+
+    def load_embedding_model(self, warmup: bool = False) -> None:
         """
         Load embedding model into memory
+
+        :param warmup: Run a throwaway encoding after loading so the first real encoding is not slowed by
+                       lazy initialization, useful when loading in the background (Default: False)
         """
         # don't reload if already loaded
         if self._embedding_model:
@@ -94,9 +95,26 @@ class PaperDatabase(Neo4jDatabase):
             loggy.warn(f"Embedding model '{self._embedding_model_name}' not downloaded locally, downloading now")
 
         from sentence_transformers import SentenceTransformer  # lazy load
-        self._embedding_model = SentenceTransformer(self._embedding_model_name, device='cpu')
+        model = SentenceTransformer(self._embedding_model_name, device='cpu')
+        if warmup:
+            model.encode("warmup", show_progress_bar=False)
+        # only publish the model once ready so other callers don't use a partially initialized model
+        self._embedding_model = model
         loggy.info(f"Loaded '{self._embedding_model_name}' in {timer.format_time()}s")
 
+    def _embed_query(self, nl_query: str) -> List[float]:
+        """
+        Embed a natural language query, only encoding each query once
+
+        :param nl_query: Natural language query to embed
+        :return: Query embedding
+        """
+        if nl_query not in self._query_embeddings:
+            # lazy load embedding model
+            self.load_embedding_model()
+            self._query_embeddings[nl_query] = self._embedding_model.encode(nl_query, show_progress_bar=False).tolist()
+        return self._query_embeddings[nl_query]
+
     def start_run(self) -> int:
         """
         Start a run in the database
@@ -105,7 +123,7 @@ class PaperDatabase(Neo4jDatabase):
         """
         # get the latest run to +1
         query = "MATCH (n:Run) RETURN n.id ORDER BY toInteger(n.id) DESC LIMIT 1"
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             latest_run = session.run(query).single()
             new_run_id = latest_run['n.id'] + 1 if latest_run else 1  # init at 1 if no previous runs
         # create new run in db
@@ -180,12 +198,15 @@ class PaperDatabase(Neo4jDatabase):
                                      run_node.create_relationship_to(paper_node.type, RelationshipType.ADDED),
                                      paper_node)
 
-    def insert_run_paper_batch(self, run_id: int, hits: List[Tuple[PaperDTO, int]]) -> None:
+    def insert_run_paper_batch(self, run_id: int, hits: List[Tuple[PaperDTO, int]],
+                               update_embeddings: bool = True) -> None:
         """
         Insert a batch of papers found by an OpenAlex run and generate title embeddings for new papers
 
         :param run_id: ID of run this batch of papers was found in
         :param hits: List of papers and their OpenAlex search ranking
+        :param update_embeddings: Generate missing title embeddings after inserting, disable when inserting
+                                  many batches and call update_missing_title_embeddings once after (Default: True)
         """
         # get match ids
         match_ids, dtos = [], []
@@ -210,13 +231,14 @@ class PaperDatabase(Neo4jDatabase):
         MERGE (run)-[r:{RelationshipType.ADDED.value}]->(paper)
         SET r.rank = item.rank
         """
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             session.run(query, run_id=run_id, ranked_papers=ranked_papers)
 
         # update title embeddings
-        self._update_missing_title_embeddings()
+        if update_embeddings:
+            self.update_missing_title_embeddings()
 
-    def _update_missing_title_embeddings(self) -> None:
+    def update_missing_title_embeddings(self) -> None:
         """
         Fetch all papers that are missing title embeddings and calculate and set value
         """
@@ -229,7 +251,7 @@ class PaperDatabase(Neo4jDatabase):
         RETURN p.match_id AS match_id, p.id AS id
         """
         # fetch titles with missing embeddings
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             result = session.run(missing_title_embeddings_query)
             missing = [r.data() for r in result]
 
@@ -249,7 +271,7 @@ class PaperDatabase(Neo4jDatabase):
             {"match_id": paper["match_id"], "embedding": emb}
             for paper, emb in zip(missing, title_embeddings)
         ]
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             session.run(update_query, rows=rows)
 
     def insert_citation_paper_batch(self, source_title: str, papers: List[PaperDTO]) -> None:
@@ -262,22 +284,46 @@ class PaperDatabase(Neo4jDatabase):
         # wrapper to keep relationship logic internal
         self._insert_paper_batch(Node.create(NodeType.PAPER, {'id': source_title}), RelationshipType.REFERENCES, papers)
 
+    def insert_citation_paper_bulk(self, citations: List[Tuple[str, PaperDTO]]) -> None:
+        """
+        Insert papers cited by many source papers in a single query
+
+        :param citations: List of source paper title and the paper it cites
+        """
+        # exit early if nothing to insert
+        if not citations:
+            return
+        # convert to nodes
+        paper_nodes: List[Node] = [Node.create(NodeType.PAPER, asdict(p)) for _, p in citations]
+        query_body = _format_paper_batch_insert_query(paper_nodes)
+
+        # construct the final query
+        query = f"""
+        {query_body}
+        WITH n, paper
+        MERGE (source:{NodeType.PAPER.value} {{match_id: paper.source_match_id}})
+        MERGE (source)-[:{RelationshipType.REFERENCES.value}]->(n)
+        """
+
+        # batch insert
+        with self._get_driver().session() as session:
+            session.run(query,
+                        papers=[{'source_match_id': Node.create(NodeType.PAPER, {'id': source_title}).match_id,
+                                 'match_id': node.match_id, **node.required_properties, **node.properties}
+                                for (source_title, _), node in zip(citations, paper_nodes)])
+
     def insert_paper_batch(self, papers: List[PaperDTO]) -> None:
         """
         Batch insert a list of papers
 
         :param papers: List of papers
         """
-        # ensure open connection
-        if not self._driver:
-            raise RuntimeError("Database driver is not initialized")
-
         # convert to nodes
         paper_nodes: List[Node] = [Node.create(NodeType.PAPER, asdict(p)) for p in papers]
         query = _format_paper_batch_insert_query(paper_nodes)
 
         # batch insert
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             session.run(query,
                         papers=[{'match_id': node.match_id, **node.required_properties, **node.properties}
                                 for node in paper_nodes])
@@ -293,10 +339,6 @@ class PaperDatabase(Neo4jDatabase):
         :param rel_type: Relationship of source node to batch
         :param papers: List of papers
         """
-        # ensure open connection
-        if not self._driver:
-            raise RuntimeError("Database driver is not initialized")
-
         # convert to nodes
         paper_nodes: List[Node] = [Node.create(NodeType.PAPER, asdict(p)) for p in papers]
         query_body = _format_paper_batch_insert_query(paper_nodes)
@@ -310,7 +352,7 @@ class PaperDatabase(Neo4jDatabase):
         """
 
         # batch insert
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             session.run(query,
                         match_id=source_node.match_id,
                         papers=[{'match_id': node.match_id, **node.required_properties, **node.properties}
@@ -323,7 +365,7 @@ class PaperDatabase(Neo4jDatabase):
         :return: Number of papers in database
         """
         query = f"MATCH (p:{NodeType.PAPER.value}) RETURN count(p) AS count"
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             record = session.run(query).single()
             return record['count']
 
@@ -339,7 +381,7 @@ class PaperDatabase(Neo4jDatabase):
         query = f"MATCH (p:{node.type.value}) WHERE p.match_id = $match_id RETURN p"
 
         # exe query
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             record = session.run(query, match_id=node.match_id).single()
             # not found
             if not record:
@@ -362,16 +404,16 @@ class PaperDatabase(Neo4jDatabase):
         RETURN p
         """
         # exe query
-        with self._driver.session() as session:
-            papers = [r['p'] for r in list(session.run(query, match_ids=match_ids))]
-            # convert to dtos
-            return [PaperDTO.create_dto(p) for p in papers]
+        with self._get_driver().session() as session:
+            # convert to dtos while streaming the records
+            return [PaperDTO.create_dto(r['p']) for r in session.run(query, match_ids=match_ids)]
 
-    def get_unprocessed_papers(self, paper_limit: int = None) -> List[PaperDTO]:
+    def get_unprocessed_papers(self, paper_limit: int = None, exclude_ids: Collection[str] = None) -> List[PaperDTO]:
         """
         Get unprocessed papers from the database
 
         :param paper_limit: Limit the max number of papers to return (Default: None)
+        :param exclude_ids: Ids of papers to skip, ie papers already attempted (Default: None)
         :return: List of PaperDTOs
         """
         # build query
@@ -380,13 +422,35 @@ class PaperDatabase(Neo4jDatabase):
         WHERE p.pdf_url IS NOT NULL 
         AND p.download_status IS NULL 
         AND p.grobid_status IS NULL
+        {'AND NOT p.id IN $exclude_ids' if exclude_ids else ''}
         RETURN p{f' LIMIT {paper_limit}' if paper_limit else ''}
         """
         # exe query
-        with self._driver.session() as session:
-            papers = [r['p'] for r in list(session.run(query))]
-            # convert to dtos
-            return [PaperDTO.create_dto(p) for p in papers]
+        with self._get_driver().session() as session:
+            # convert to dtos while streaming the records
+            return [PaperDTO.create_dto(r['p']) for r in session.run(query, exclude_ids=list(exclude_ids or []))]
+
+    def has_unprocessed_papers(self, only_open_access: bool = False, exclude_ids: Collection[str] = None) -> bool:
+        """
+        Check if there are any unprocessed papers without fetching them
+
+        :param only_open_access: Only check papers that have an 'open access' label (Default: False)
+        :param exclude_ids: Ids of papers to skip, ie papers already attempted (Default: None)
+        :return: True if at least one unprocessed paper exists, False otherwise
+        """
+        query = f"""
+        RETURN EXISTS {{
+          MATCH (p:{NodeType.PAPER.value})
+          WHERE p.pdf_url IS NOT NULL
+          AND p.download_status IS NULL
+          AND p.grobid_status IS NULL
+          {'AND p.is_open_access' if only_open_access else ''}
+          {'AND NOT p.id IN $exclude_ids' if exclude_ids else ''}
+        }} AS has_unprocessed
+        """
+        # exe query
+        with self._get_driver().session() as session:
+            return session.run(query, exclude_ids=list(exclude_ids or [])).single()['has_unprocessed']
 
     def get_citations(self, source_title: str, unprocessed: bool = False) -> List[PaperDTO]:
         """
@@ -403,10 +467,62 @@ class PaperDatabase(Neo4jDatabase):
         RETURN c
         """
         # exe query
-        with self._driver.session() as session:
-            citations = [r['c'] for r in list(session.run(query, source_title=source_title))]
-            # convert to dtos
-            return [PaperDTO.create_dto(c) for c in citations]
+        with self._get_driver().session() as session:
+            # convert to dtos while streaming the records
+            return [PaperDTO.create_dto(r['c']) for r in session.run(query, source_title=source_title)]
+
+    def get_citations_batch(self, source_titles: List[str], unprocessed: bool = False) -> List[PaperDTO]:
+        """
+        Get the citations of several papers in a single query
+
+        :param source_titles: Titles of papers to get citations for
+        :param unprocessed: Only get unprocessed citations (Default: False)
+        :return: Deduplicated list of citations
+        """
+        query = f"""
+        UNWIND $source_titles AS source_title
+        MATCH (s:{NodeType.PAPER.value})-[:{RelationshipType.REFERENCES.value}]->(c:{NodeType.PAPER.value})
+        WHERE s.id = source_title
+        {'AND c.download_status IS NULL AND c.openalex_status IS NULL' if unprocessed else ''}
+        RETURN DISTINCT c
+        """
+        # exe query
+        with self._get_driver().session() as session:
+            # convert to dtos while streaming the records
+            return [PaperDTO.create_dto(r['c']) for r in session.run(query, source_titles=source_titles)]
+
+    def count_citations(self, source_title: str) -> int:
+        """
+        Count the citations of a given paper without fetching them
+
+        :param source_title: Title of paper to count citations for
+        :return: Number of citations
+        """
+        query = f"""
+        MATCH (s:{NodeType.PAPER.value})-[:{RelationshipType.REFERENCES.value}]->(c:{NodeType.PAPER.value})
+        WHERE s.id = $source_title
+        RETURN count(c) AS citations
+        """
+        # exe query
+        with self._get_driver().session() as session:
+            return session.run(query, source_title=source_title).single()['citations']
+
+    def get_citation_counts(self, source_titles: List[str]) -> Dict[str, int]:
+        """
+        Count the citations of several papers in a single query
+
+        :param source_titles: Titles of papers to count citations for
+        :return: Number of citations by paper title
+        """
+        query = f"""
+        UNWIND $source_titles AS source_title
+        OPTIONAL MATCH (s:{NodeType.PAPER.value})-[:{RelationshipType.REFERENCES.value}]->(c:{NodeType.PAPER.value})
+        WHERE s.id = source_title
+        RETURN source_title, count(c) AS citations
+        """
+        # exe query
+        with self._get_driver().session() as session:
+            return {r['source_title']: r['citations'] for r in session.run(query, source_titles=source_titles)}
 
     def get_embedding_match_score(self, title: str, nl_query: str) -> Tuple[float | None, float | None]:
         """
@@ -416,12 +532,20 @@ class PaperDatabase(Neo4jDatabase):
         :param nl_query: Natural language query to generate match score with
         :return: Title and abstract score, None if paper not found
         """
-        # lazy load embedding model
-        self.load_embedding_model()
+        return self.get_embedding_match_scores([title], nl_query).get(title, (None, None))
 
+    def get_embedding_match_scores(self, titles: List[str],
+                                   nl_query: str) -> Dict[str, Tuple[float | None, float | None]]:
+        """
+        Get the embedding match scores of several papers with a single query embedding and search
+
+        :param titles: Titles of papers to search
+        :param nl_query: Natural language query to generate match scores with
+        :return: Title and abstract score by paper title, papers not found are omitted
+        """
         # init
-        node = Node.create(NodeType.PAPER, {'id': title})
-        nl_query_embedding = self._embedding_model.encode(nl_query, show_progress_bar=False).tolist()
+        titles_by_match_id = {Node.create(NodeType.PAPER, {'id': t}).match_id: t for t in titles}
+        nl_query_embedding = self._embed_query(nl_query)
 
         query = """
         CALL db.index.vector.queryNodes(
@@ -441,8 +565,9 @@ class PaperDatabase(Neo4jDatabase):
           tnode AS node,
           titleScore,
           abstractScore
-        WHERE node.match_id = $match_id 
+        WHERE node.match_id IN $match_ids
         RETURN
+          node.match_id AS match_id,
           titleScore,
           abstractScore
         """
@@ -450,14 +575,12 @@ class PaperDatabase(Neo4jDatabase):
         params = {
             "topK": 100,
             "embedding": nl_query_embedding,
-            "match_id": node.match_id,
+            "match_ids": list(titles_by_match_id),
         }
         # exe query
-        with self._driver.session() as session:
-            record = session.run(query, **params).single()
-            if record is None:
-                return None, None
-            return record["titleScore"], record["abstractScore"]
+        with self._get_driver().session() as session:
+            return {titles_by_match_id[r["match_id"]]: (r["titleScore"], r["abstractScore"])
+                    for r in session.run(query, **params)}
 
     def search_papers_by_nl_query(self, nl_query: str,
                                   unprocessed: bool = False,
@@ -466,7 +589,9 @@ class PaperDatabase(Neo4jDatabase):
                                   paper_limit: int = 100,
                                   min_score: float = None,
                                   order_by_abstract: bool = False,
-                                  include_scores: bool = False) -> List[PaperDTO] | List[Tuple[PaperDTO, float, float]]:
+                                  include_scores: bool = False,
+                                  exclude_ids: Collection[str] = None
+                                  ) -> List[PaperDTO] | List[Tuple[PaperDTO, float, float]]:
         """
         Get papers that best match the provided query, ranked in order of best title match then abstract
         The similarity score can range from 1 (exact match) and -1 (complete opposite match)
@@ -479,6 +604,7 @@ class PaperDatabase(Neo4jDatabase):
         :param min_score: Minimum similarity score of prompt to abstract, must be [-1,1] (Default: None, .4 recommended)
         :param order_by_abstract: Return search order by abstract match then title match (Default: False)
         :param include_scores: Include the match score of nl_query (Default: False)
+        :param exclude_ids: Ids of papers to skip, ie papers already attempted (Default: None)
         :raises ValueError: If provided min_score is outside [-1,1] range
         :return: List of top_k papers ids ranked in order of best title match then abstract if available
         """
@@ -486,10 +612,7 @@ class PaperDatabase(Neo4jDatabase):
         if min_score and (min_score > 1 or min_score < -1):
             raise ValueError("Param 'min_score' must be between -1 and 1")
 
-        # lazy load embedding model
-        self.load_embedding_model()
-
-        nl_query_embedding = self._embedding_model.encode(nl_query, show_progress_bar=False).tolist()
+        nl_query_embedding = self._embed_query(nl_query)
 
         # build where clause
         conditions = []
@@ -502,6 +625,8 @@ class PaperDatabase(Neo4jDatabase):
             conditions.append("node.is_open_access")
         if require_abstract:
             conditions.append("node.abstract_embedding")
+        if exclude_ids:
+            conditions.append("NOT node.id IN $excludeIds")
         where_clause = ""
         if conditions:
             where_clause = "WHERE " + " AND ".join(conditions)
@@ -537,9 +662,10 @@ class PaperDatabase(Neo4jDatabase):
         params: Dict[str, Any] = {'topK': 100 * paper_limit,
                                   'embedding': nl_query_embedding,
                                   'minScore': min_score,
-                                  'paper_limit': paper_limit}
+                                  'paper_limit': paper_limit,
+                                  'excludeIds': list(exclude_ids or [])}
         # exe query
-        with self._driver.session() as session:
+        with self._get_driver().session() as session:
             results = session.run(query, **params)
             if include_scores:
                 return [(PaperDTO.create_dto(r["node"]), r["titleScore"], r["abstractScore"]) for r in results]
@@ -578,10 +704,9 @@ class PaperDatabase(Neo4jDatabase):
         {f' LIMIT {paper_limit}' if paper_limit else ''}
         """
         # exe query
-        with self._driver.session() as session:
-            papers = [r['p'] for r in list(session.run(query))]
-            # convert to dtos
-            return [PaperDTO.create_dto(p) for p in papers]
+        with self._get_driver().session() as session:
+            # convert to dtos while streaming the records
+            return [PaperDTO.create_dto(r['p']) for r in session.run(query)]
 
 
 def _is_model_local(embedding_model: str) -> bool:
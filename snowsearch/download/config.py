@@ -10,8 +10,14 @@ Description: Defaults for file downloads
 MAX_CONCURRENT_DOWNLOADS = 10
 MAX_PDF_COUNT = 100  # max pdfs allowed to be downloaded at a time
 PDF_MAGIC = b'%PDF-'  # header bytes of pdf
+# retry downloads when the host is rate limiting or temporarily unavailable
 MAX_RETRIES = 3
+RETRY_STATUS_CODES = (429, 503)
+RETRY_BACKOFF = 1  # base seconds to wait, doubled each attempt
+MAX_RETRY_AFTER = 60  # give up if the host asks to wait longer than this
+DNS_CACHE_TTL = 300  # seconds to cache host lookups for across batches
 KILOBYTE = 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * KILOBYTE  # 1 MB
 
 DOWNLOAD_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:116.0) Gecko/20100101 Firefox/116.0",
@@ -5,10 +5,15 @@ Description: Attempt to Download PDF from file
 
 @author Derek Garcia
 """
+import asyncio
+import random
+from asyncio import IncompleteReadError
+
 import loggy
-from aiohttp import ClientSession, ClientResponseError
+from aiohttp import ClientSession, ClientResponseError, ClientResponse
 
-from download.config import DOWNLOAD_HEADERS, KILOBYTE, PDF_MAGIC
+from download.config import DOWNLOAD_HEADERS, DOWNLOAD_CHUNK_SIZE, PDF_MAGIC, MAX_RETRIES, RETRY_STATUS_CODES, \
+    RETRY_BACKOFF, MAX_RETRY_AFTER
 from download.exception import NoFileDataError, InvalidFileFormatError, PaperDownloadError
 
 
@@ -25,31 +30,75 @@ async def download_pdf(session: ClientSession, title: str, pdf_url: str, output_
     :raises PaperDownloadError: If fail to download PDF
     """
     try:
-        async with session.get(pdf_url, headers=DOWNLOAD_HEADERS) as response:
-            loggy.debug_info(f"Downloading '{response.url}'")
-            response.raise_for_status()
-            # download pdf
-            first_pass = True
-            with open(output_path, 'wb') as f:
-                while True:
-                    chunk = await response.content.read(KILOBYTE)
-
-                    if not chunk:
-                        # no data to write
-                        if first_pass:
-                            raise NoFileDataError(title, pdf_url)
-                        # break if no data left to read
-                        break
-
-                    # validate pdf
-                    if first_pass:
-                        # file is not a pdf
-                        if not chunk.startswith(PDF_MAGIC):
-                            raise InvalidFileFormatError(title, pdf_url)
-                        first_pass = False
-
-                    f.write(chunk)
+        for attempt in range(MAX_RETRIES + 1):
+            async with session.get(pdf_url, headers=DOWNLOAD_HEADERS) as response:
+                # retry if rate limited or unavailable, unless out of retries or asked to wait too long
+                if response.status in RETRY_STATUS_CODES and attempt < MAX_RETRIES:
+                    delay = _get_retry_delay(response.headers.get('Retry-After'), attempt)
+                    if delay is not None:
+                        loggy.debug_warn(f"Got {response.status} for '{title}', retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+                        continue
+                await _save_pdf(response, title, pdf_url, output_path)
+                return
+    except (NoFileDataError, InvalidFileFormatError):
+        # already specific, let caller handle
+        raise
     except ClientResponseError as e:
         raise PaperDownloadError(title, e.status, e.message, pdf_url) from e
     except Exception as e:
         raise PaperDownloadError(title, 500, str(e), pdf_url) from e
+
+
+def _get_retry_delay(retry_after: str | None, attempt: int) -> float | None:
+    """
+    Get the seconds to wait before retrying a download, using exponential backoff with jitter
+    so concurrent downloads don't retry in lockstep
+
+    :param retry_after: Retry-After header value, if any
+    :param attempt: Number of attempts already made
+    :return: Seconds to wait, None if the host asks to wait too long
+    """
+    delay = RETRY_BACKOFF * 2 ** attempt
+    # only seconds are supported, ignore http dates
+    try:
+        delay = max(float(retry_after), delay)
+    except (TypeError, ValueError):
+        pass
+    if delay > MAX_RETRY_AFTER:
+        return None
+    return delay + random.uniform(0, RETRY_BACKOFF)
+
+
+async def _save_pdf(response: ClientResponse, title: str, pdf_url: str, output_path: str) -> None:
+    """
+    Validate and write a pdf response to file
+
+    :param response: Response with the pdf
+    :param title: Name of paper to download
+    :param pdf_url: URL of pdf to download
+    :param output_path: Path to write PDF to
+    :raises ClientResponseError: If the response failed
+    :raises NoFileDataError: If no data to download
+    :raises InvalidFileFormatError: If the file is not a PDF
+    """
+    loggy.debug_info(f"Downloading '{response.url}'")
+    response.raise_for_status()
+    # validate pdf before writing anything
+    try:
+        header = await response.content.readexactly(len(PDF_MAGIC))
+    except IncompleteReadError as e:
+        # no data to write
+        if not e.partial:
+            raise NoFileDataError(title, pdf_url) from e
+        # too short to be a pdf
+        raise InvalidFileFormatError(title, pdf_url) from e
+    # file is not a pdf
+    if header != PDF_MAGIC:
+        raise InvalidFileFormatError(title, pdf_url)
+
+    # download pdf in large chunks to reduce awaits and writes
+    with open(output_path, 'wb') as f:
+        f.write(header)
+        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
@@ -6,6 +6,7 @@ Description: DTOs for OpenAlex
 """
 
 import hashlib
+import textwrap
 from dataclasses import dataclass, fields
 from datetime import datetime, date
 from typing import Dict
@@ -47,28 +48,19 @@ class PaperDTO:
         filtered_data = {k: v for k, v in data.items() if k in field_names}
         return cls(**filtered_data)
 
-    def format_abstract(self, wrap: int = DEFAULT_WRAP) -> str | None:
+    @property
+    def formatted_abstract(self) -> str | None:
         """
-        Format the abstract to fit within a wrap
+        Abstract wrapped to fit within the default wrap with each line indented by a tab
 
-        :param wrap: Character limit to wrap at (Default: 100)
         :return: Formatted abstract, None if no abstract to format
         """
         # no text to format
         if not self.abstract_text:
             return None
-        # format abstract
-        abstract_text = self.abstract_text.split()
-        line = "\t"
-        abstract_text_formatted = ""
-        while abstract_text:
-            line += f"{abstract_text.pop(0)} "
-            # print if exceed char limit or nothing left to add
-            if len(line) > wrap or not abstract_text:
-                abstract_text_formatted += f"{line.strip()}\n"
-                line = "\t"
-        # return results
-        return abstract_text_formatted
+        # collapse whitespace before wrapping
+        return textwrap.fill(" ".join(self.abstract_text.split()), DEFAULT_WRAP,
+                             initial_indent='\t', subsequent_indent='\t')
 
     def generate_short_uid(self) -> str:
         """
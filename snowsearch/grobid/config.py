@@ -11,3 +11,4 @@ DEFAULT_PORT = 8070
 
 MAX_GROBID_REQUESTS = 1
 MAX_CONCURRENT_DOWNLOADS = 10
+MAX_TEI_PARSE_WORKERS = 2  # processes to parse grobid responses in
@@ -7,8 +7,10 @@ Description: Grobid worker that handles downloading and processing open access p
 
 import asyncio
 import logging
+import multiprocessing
 import os
 from asyncio import Semaphore
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from os.path import exists
 from tempfile import NamedTemporaryFile, TemporaryDirectory
@@ -16,17 +18,17 @@ from typing import List, Dict, Any
 
 import grobid_tei_xml
 import loggy
-from aiohttp import ClientSession
+from aiohttp import ClientSession, TCPConnector
 from grobid_client.grobid_client import GrobidClient
 from loggy import Timer
 
 from db.paper_database import PaperDatabase
-from download.config import MAX_CONCURRENT_DOWNLOADS, MAX_PDF_COUNT
+from download.config import MAX_CONCURRENT_DOWNLOADS, MAX_PDF_COUNT, DNS_CACHE_TTL
 from download.exception import NoFileDataError, InvalidFileFormatError, PaperDownloadError
 from download.pdf import download_pdf
 from dto.grobid_dto import GrobidDTO
 from dto.paper_dto import PaperDTO
-from grobid.config import MAX_GROBID_REQUESTS
+from grobid.config import MAX_GROBID_REQUESTS, MAX_TEI_PARSE_WORKERS
 from grobid.exception import GrobidProcessError
 
 # Mute grobid client logs
@@ -52,13 +54,53 @@ class GrobidWorker:
         :param client_config: Optional Grobid client details (Default: None)
         """
         # init with params if provided
-        logger.debug_msg("Attempting to access Grobid server")
+        loggy.debug_info("Attempting to access Grobid server")
         self._grobid_client = GrobidClient(**client_config) if client_config else GrobidClient()
-        logger.debug_msg("Connected Successfully")
+        loggy.debug_info("Connected Successfully")
         # set semaphore limits
         self._grobid_semaphore = Semaphore(max_grobid_requests)
         self._download_semaphore = Semaphore(max_concurrent_downloads)
         self._pdf_file_semaphore = Semaphore(max_local_pdfs)
+        # reuse connections and dns lookups across batches
+        self._max_concurrent_downloads = max_concurrent_downloads
+        self._session: ClientSession | None = None
+        # parse TEI in other processes so large documents don't block the event loop
+        self._parse_pool: ProcessPoolExecutor | None = None
+
+    def _get_session(self) -> ClientSession:
+        """
+        Get the shared HTTP session, creating a new one if needed
+
+        :return: HTTP session to download pdfs with
+        """
+        if not self._session or self._session.closed:
+            # cap connections per host so a single publisher isn't flooded
+            connector = TCPConnector(limit_per_host=self._max_concurrent_downloads, ttl_dns_cache=DNS_CACHE_TTL)
+            self._session = ClientSession(connector=connector)
+        return self._session
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        """
+        Get the TEI parsing pool, only creating it once needed
+
+        :return: Process pool to parse TEI with
+        """
+        if not self._parse_pool:
+            # spawn rather than fork since this process already runs threads
+            self._parse_pool = ProcessPoolExecutor(max_workers=MAX_TEI_PARSE_WORKERS,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+        return self._parse_pool
+
+    async def close(self) -> None:
+        """
+        Close the shared HTTP session and TEI parsing pool if open
+        """
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._parse_pool:
+            self._parse_pool.shutdown()
+        self._parse_pool = None
 
     async def process_paper(self, pdf_file_path: str, title: str = None) -> GrobidDTO:
         """
@@ -71,7 +113,7 @@ class GrobidWorker:
         timer = Timer()
         # block to prevent overwhelming grobid server
         async with self._grobid_semaphore:
-            logger.debug_msg(f"Processing '{pdf_file_path}'")
+            loggy.debug_info(f"Processing '{pdf_file_path}'")
             _, status, content = await asyncio.to_thread(self._grobid_client.process_pdf,
                                                          service="processFulltextDocument",
                                                          pdf_file=pdf_file_path,
@@ -87,10 +129,19 @@ class GrobidWorker:
         if status != 200:
             raise GrobidProcessError(title, status, content)
         # else parse TEI
-        doc = grobid_tei_xml.parse_document_xml(content)
+        doc = await asyncio.get_running_loop().run_in_executor(self._get_parse_pool(),
+                                                               grobid_tei_xml.parse_document_xml, content)
         loggy.debug_info(f"Processed '{pdf_file_path}' in {timer.format_time()}s | {title}")
         timestamp = datetime.now()
-        citations = [PaperDTO(c.title, doi=c.doi, time_added=timestamp) for c in doc.citations if c.title]
+        # papers are matched by lowercase title, so only keep one citation per title, preferring one with a doi
+        unique_citations: Dict[str, PaperDTO] = {}
+        for c in doc.citations:
+            if not c.title:
+                continue
+            key = c.title.lower()
+            if key not in unique_citations or (c.doi and not unique_citations[key].doi):
+                unique_citations[key] = PaperDTO(c.title, doi=c.doi, time_added=timestamp)
+        citations = list(unique_citations.values())
         # use provided title if provided, else use one parsed by grobid
         # todo - doc.header.title null?
         paper = PaperDTO(title if title else doc.header.title,
@@ -144,53 +195,53 @@ class GrobidWorker:
         num_misc_error = 0
         # create tmp working directory to download all papers to
         with TemporaryDirectory(prefix='grobid-') as work_dir:
-            async with ClientSession() as session:
-                # queue tasks
-                tasks = [self._process_paper_task(session, work_dir, p.id, p.pdf_url) for p in papers]
-                loggy.debug_info(f"Processing {len(papers)} papers")
-                # save results as complete
-                for future in loggy.async_data_queue(tasks, "Processing papers", "papers"):
-                    try:
-                        result: GrobidDTO = await future
-                        result.paper.download_status = 200
-                        # update abstract
-                        paper_db.upsert_paper(result.paper)
-
-                        # add referenced papers, if any
-                        if result.citations:
-                            unique_citations.update(result.citations)
-                            paper_db.insert_citation_paper_batch(result.paper.id, result.citations)
-
-                        num_success += 1
-
-                    # no file to download
-                    except NoFileDataError as e:
-                        loggy.error(e)
-                        paper_db.upsert_paper(PaperDTO(e.paper_title, download_status=204))
-                        num_fail_download += 1
-
-                    # bad file format
-                    except InvalidFileFormatError as e:
-                        loggy.error(e)
-                        paper_db.upsert_paper(PaperDTO(e.paper_title, download_status=415))
-                        num_fail_download += 1
-
-                    # failed to download pdf
-                    except PaperDownloadError as e:
-                        loggy.error(e)
-                        paper_db.upsert_paper(
-                            PaperDTO(e.paper_title, download_status=e.status_code, download_error_msg=e.error_msg))
-                        num_fail_download += 1
-                    # failed to parse pdf
-                    except GrobidProcessError as e:
-                        loggy.error(e)
-                        paper_db.upsert_paper(
-                            PaperDTO(e.paper_title, grobid_status=e.status_code, grobid_error_msg=e.error_msg))
-                        num_fail_process += 1
-                    # misc exception
-                    except Exception as e:
-                        loggy.error(e)
-                        num_misc_error += 1
+            session = self._get_session()
+            # queue tasks
+            tasks = [self._process_paper_task(session, work_dir, p.id, p.pdf_url) for p in papers]
+            loggy.debug_info(f"Processing {len(papers)} papers")
+            # save results as complete
+            for future in loggy.async_data_queue(tasks, "Processing papers", "papers"):
+                try:
+                    result: GrobidDTO = await future
+                    result.paper.download_status = 200
+                    # update abstract
+                    paper_db.upsert_paper(result.paper)
+
+                    # add referenced papers, if any
+                    if result.citations:
+                        unique_citations.update(result.citations)
+                        paper_db.insert_citation_paper_batch(result.paper.id, result.citations)
+
+                    num_success += 1
+
+                # no file to download
+                except NoFileDataError as e:
+                    loggy.error(e)
+                    paper_db.upsert_paper(PaperDTO(e.paper_title, download_status=204))
+                    num_fail_download += 1
+
+                # bad file format
+                except InvalidFileFormatError as e:
+                    loggy.error(e)
+                    paper_db.upsert_paper(PaperDTO(e.paper_title, download_status=415))
+                    num_fail_download += 1
+
+                # failed to download pdf
+                except PaperDownloadError as e:
+                    loggy.error(e)
+                    paper_db.upsert_paper(
+                        PaperDTO(e.paper_title, download_status=e.status_code, download_error_msg=e.error_msg))
+                    num_fail_download += 1
+                # failed to parse pdf
+                except GrobidProcessError as e:
+                    loggy.error(e)
+                    paper_db.upsert_paper(
+                        PaperDTO(e.paper_title, grobid_status=e.status_code, grobid_error_msg=e.error_msg))
+                    num_fail_process += 1
+                # misc exception
+                except Exception as e:
+                    loggy.error(e)
+                    num_misc_error += 1
 
         # report results
         if len(papers):
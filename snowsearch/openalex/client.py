@@ -11,7 +11,7 @@ import asyncio
 import hashlib
 import json
 import os
-from asyncio import Semaphore
+from asyncio import Semaphore, Lock
 from json import JSONDecodeError
 from typing import List, Dict, Tuple, Any
 
@@ -25,8 +25,10 @@ from db.config import DOI_PREFIX
 from db.paper_database import PaperDatabase
 from dto.paper_dto import PaperDTO
 from openalex.config import POLITE_RATE_LIMIT_SLEEP, DEFAULT_RATE_LIMIT_SLEEP, MAX_PER_PAGE, OPENALEX_BASE, \
-    QUERY_JSON_RE, MAX_RETRIES, NL_TO_QUERY_CONTEXT_FILE, MAX_DOI_PER_PAGE
+    QUERY_JSON_RE, MAX_RETRIES, NL_TO_QUERY_CONTEXT_FILE, MAX_DOI_PER_PAGE, MAX_CONCURRENT_REQUESTS, \
+    MAX_RATE_LIMIT_RETRIES, DEFAULT_RETRY_AFTER, MAX_RETRY_AFTER
 from openalex.exception import MissingOpenAlexEntryError, ExceedMaxQueryGenerationAttemptsError
+from util.prompt import load_prompt
 
 
 class _QueryJSONRetryHandler(JSONRetryHandler):
@@ -51,13 +53,14 @@ class OpenAlexClient:
     Client to interact with the OpenAlex API
     """
 
-    def __init__(self, email: str = None):
+    def __init__(self, email: str = None, max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS):
         """
         Create new OpenAlex client
 
         https://docs.openalex.org/how-to-use-the-api/rate-limits-and-authentication#the-polite-pool
 
         :param email: Optional email to add to the polite pool
+        :param max_concurrent_requests: Max number of requests to have in flight at once (Default: 5)
         """
         self._email = email
         if not email:
@@ -69,8 +72,56 @@ class OpenAlexClient:
             self._api_key_available = True
             loggy.info("Found OpenAlex API key")
         # load content for one-shot
-        with open(NL_TO_QUERY_CONTEXT_FILE, 'r', encoding='utf-8') as f:
-            self._nl_to_query_context = f.read()
+        self._nl_to_query_context = load_prompt(NL_TO_QUERY_CONTEXT_FILE)
+        # shared across all fetches to limit requests in flight
+        self._request_semaphore = Semaphore(max_concurrent_requests)
+        # requests start at most once per rate limit window to prevent tripping rate limit
+        self._rate_limit_lock = Lock()
+        self._next_request_time = 0.0
+        # shared between requests to reuse connections, opened on first use
+        self._session: ClientSession | None = None
+
+    def _get_session(self) -> ClientSession:
+        """
+        Get the shared HTTP session, creating a new one if needed
+
+        :return: HTTP session
+        """
+        if not self._session or self._session.closed:
+            # identify with email for the polite pool
+            headers = {'User-Agent': f"snowsearch (mailto:{self._email})"} if self._email else None
+            self._session = ClientSession(headers=headers)
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Close the shared HTTP session if open
+        """
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _wait_for_rate_limit(self) -> None:
+        """
+        Block until the next request can be made without exceeding the rate limit
+        """
+        async with self._rate_limit_lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_request_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # openalex allows 10 requests per second for every client
+            self._next_request_time = loop.time() + POLITE_RATE_LIMIT_SLEEP
+
+    async def _pause_requests(self, seconds: float) -> None:
+        """
+        Delay all future requests after being rate limited
+
+        :param seconds: Seconds to wait before the next request
+        """
+        async with self._rate_limit_lock:
+            loop = asyncio.get_running_loop()
+            self._next_request_time = max(self._next_request_time, loop.time() + seconds)
 
     def _add_auth(self, params_obj: Dict[str, str | int]) -> None:
         """
@@ -104,15 +155,22 @@ class OpenAlexClient:
         # update params
         self._add_auth(params)
         params['per_page'] = per_page
-        # block to respect rate limit
-        await asyncio.sleep(POLITE_RATE_LIMIT_SLEEP)
-        # make the request, remove key for logging
-        url = URL(f"{OPENALEX_BASE}/{openalex_endpoint.removeprefix('/')}").with_query(params).without_query_params(
-            'OPENALEX_API_KEY')
-        loggy.debug_info(f"Querying '{url}'")
-        async with session.get(url, params=params) as response:
-            response.raise_for_status()
-            return await response.json()
+        url = URL(f"{OPENALEX_BASE}/{openalex_endpoint.removeprefix('/')}")
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            # block to respect rate limit
+            await self._wait_for_rate_limit()
+            # make the request, remove key for logging
+            loggy.debug_info(f"Querying '{url.with_query(params).without_query_params('api_key')}'")
+            async with session.get(url, params=params) as response:
+                # retry if rate limited unless out of retries or credits
+                if response.status == 429 and attempt < MAX_RATE_LIMIT_RETRIES:
+                    retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                    if retry_after <= MAX_RETRY_AFTER:
+                        loggy.debug_warn(f"Rate limited by OpenAlex, retrying in {retry_after}s")
+                        await self._pause_requests(retry_after)
+                        continue
+                response.raise_for_status()
+                return await response.json()
 
     async def _fetch_page(self, session: ClientSession, oa_query: str, cursor: str = '*') -> Tuple[str, List[PaperDTO]]:
         """
@@ -218,37 +276,40 @@ class OpenAlexClient:
         :return: The number of hits found
         """
         oa_query = oa_query.replace("'", '"')
-        async with ClientSession() as session:
-            hits = await self._fetch_paper_count(session, oa_query)
-            loggy.debug_info(f"Found {hits} papers in OpenAlex")
-            # exit early if no hits
-            if not hits:
-                return 0
-            progress = loggy.manual_data_queue(hits, "Querying OpenAlex Database", "paper")
-            # fetch all papers
-            next_cursor = "*"
-            rank_offset = 0
-            update_chunk = 0
-            while True:
-                try:
-                    # save results
-                    # todo when papers are null
-                    next_cursor, papers = await self._fetch_page(session, oa_query, next_cursor)
-                    ranked_papers = [(papers[i], i + rank_offset) for i in range(0, len(papers))]
-                    rank_offset += len(papers)
-                    update_chunk = len(papers)
-                    if ranked_papers:
-                        paper_db.insert_run_paper_batch(run_id, ranked_papers)
-                    # no pages left
-                    if not next_cursor:
-                        break
-                except Exception as e:
-                    # todo - handle exceed requests per day
-                    loggy.error(e)
-                finally:
-                    # update progress
-                    if progress:
-                        progress.update(update_chunk)
+        session = self._get_session()
+        hits = await self._fetch_paper_count(session, oa_query)
+        loggy.debug_info(f"Found {hits} papers in OpenAlex")
+        # exit early if no hits
+        if not hits:
+            return 0
+        progress = loggy.manual_data_queue(hits, "Querying OpenAlex Database", "paper")
+        # fetch all papers
+        next_cursor = "*"
+        rank_offset = 0
+        update_chunk = 0
+        while True:
+            try:
+                # save results
+                # todo when papers are null
+                next_cursor, papers = await self._fetch_page(session, oa_query, next_cursor)
+                ranked_papers = [(papers[i], i + rank_offset) for i in range(0, len(papers))]
+                rank_offset += len(papers)
+                update_chunk = len(papers)
+                if ranked_papers:
+                    # embeddings are generated once after all pages are saved
+                    paper_db.insert_run_paper_batch(run_id, ranked_papers, update_embeddings=False)
+                # no pages left
+                if not next_cursor:
+                    break
+            except Exception as e:
+                # todo - handle exceed requests per day
+                loggy.error(e)
+            finally:
+                # update progress
+                if progress:
+                    progress.update(update_chunk)
+        # generate title embeddings for all new papers at once
+        paper_db.update_missing_title_embeddings()
         return hits
 
     async def fetch_and_save_paper_metadata(self,
@@ -263,7 +324,6 @@ class OpenAlexClient:
         :param skip_title_search: Optional skip title search (Default: False)
         :return: Number of papers that the metadata was found
         """
-        semaphore = Semaphore()  # semaphore so only 1 request at a time to prevent tripping rate limit
         num_doi = 0
         num_title = 0
         num_missing = 0
@@ -280,37 +340,37 @@ class OpenAlexClient:
                 titles.append(c)
         doi_chunks = [doi_and_title[i:i + MAX_DOI_PER_PAGE] for i in range(0, len(doi_and_title), MAX_DOI_PER_PAGE)]
 
-        async with ClientSession() as session:
-            # pass 1 - fetch by DOI
-            if doi_chunks:
-                doi_tasks = [_fetch_doi_batch_wrapper(semaphore, self._batch_fetch_by_doi(session, chunk))
-                             for chunk in doi_chunks]
-                for future in loggy.async_data_queue(doi_tasks, "Fetching paper details by doi", "batch"):
-                    found_papers, missing_doi_ids = await future
-                    num_doi += len(found_papers)
-                    # save titles for second pass
-                    titles += [doi_reverse_lookup.get(doi) for doi in missing_doi_ids]
-                    # save rest if any
-                    if found_papers:
-                        paper_db.insert_paper_batch(found_papers)
-
-            # pass 2 - fetch by title
-            if not skip_title_search and titles:
-                title_tasks = [_fetch_title_wrapper(semaphore, c, self._fetch_by_exact_title(session, c.id))
-                               for c in titles]
-                for future in loggy.get_data_queue(title_tasks, "Fetching paper details by title", "paper"):
-                    try:
-                        paper = await future
-                        num_title += 1
-                        paper_db.upsert_paper(paper)
-                        loggy.debug_info(f"Found '{paper.id}' by title")
-                    except MissingOpenAlexEntryError as e:
-                        num_missing += 1
-                        loggy.error(e)
-                        paper_db.upsert_paper(PaperDTO(e.title, openalex_status=404))
-                    except Exception as e:
-                        num_missing += 1
-                        loggy.error(e)
+        session = self._get_session()
+        # pass 1 - fetch by DOI
+        if doi_chunks:
+            doi_tasks = [_fetch_doi_batch_wrapper(self._request_semaphore, self._batch_fetch_by_doi(session, chunk))
+                         for chunk in doi_chunks]
+            for future in loggy.async_data_queue(doi_tasks, "Fetching paper details by doi", "batch"):
+                found_papers, missing_doi_ids = await future
+                num_doi += len(found_papers)
+                # save titles for second pass
+                titles += [doi_reverse_lookup.get(doi) for doi in missing_doi_ids]
+                # save rest if any
+                if found_papers:
+                    paper_db.insert_paper_batch(found_papers)
+
+        # pass 2 - fetch by title
+        if not skip_title_search and titles:
+            title_tasks = [_fetch_title_wrapper(self._request_semaphore, c, self._fetch_by_exact_title(session, c.id))
+                           for c in titles]
+            for future in loggy.get_data_queue(title_tasks, "Fetching paper details by title", "paper"):
+                try:
+                    paper = await future
+                    num_title += 1
+                    paper_db.upsert_paper(paper)
+                    loggy.debug_info(f"Found '{paper.id}' by title")
+                except MissingOpenAlexEntryError as e:
+                    num_missing += 1
+                    loggy.error(e)
+                    paper_db.upsert_paper(PaperDTO(e.title, openalex_status=404))
+                except Exception as e:
+                    num_missing += 1
+                    loggy.error(e)
 
         # report results
         if len(papers):
@@ -366,6 +426,19 @@ class OpenAlexClient:
             raise ExceedMaxQueryGenerationAttemptsError(model_client.model) from e
 
 
+def _parse_retry_after(retry_after: str | None) -> float:
+    """
+    Parse the seconds to wait from a Retry-After header
+
+    :param retry_after: Retry-After header value, if any
+    :return: Seconds to wait, default if missing or not in seconds
+    """
+    try:
+        return max(float(retry_after), 0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
 async def _fetch_doi_batch_wrapper(semaphore: Semaphore, callback) -> Tuple[List[PaperDTO], List[str]]:
     """
     Util wrapper for DOI batch fetching to respect semaphore
@@ -12,6 +12,12 @@ import re
 DEFAULT_RATE_LIMIT_SLEEP = 1
 # 10 requests per second
 POLITE_RATE_LIMIT_SLEEP = 0.1
+# max requests in flight at once, requests are still spaced to respect the rate limit
+MAX_CONCURRENT_REQUESTS = 5
+# retries after a 429 response, waits longer than the max are treated as exhausted credits and not retried
+MAX_RATE_LIMIT_RETRIES = 3
+DEFAULT_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
 # https://docs.openalex.org/how-to-use-the-api/get-lists-of-entities/paging?q=per_page#basic-paging
 MAX_PER_PAGE = 200
 # https://docs.openalex.org/api-guide-for-llms#bulk-lookup-by-dois
@@ -18,6 +18,8 @@ from loggy import Timer
 from dto.paper_dto import PaperDTO
 from rank.config import AVG_TOKEN_PER_WORD, RANK_CONTEXT_FILE, MAX_RETRIES
 from rank.exception import ExceedMaxRankingGenerationAttemptsError
+from rank.ranking_cache import RankingCache
+from util.prompt import load_prompt
 
 
 class AbstractRanker:
@@ -25,19 +27,28 @@ class AbstractRanker:
     Ranker that uses an LLM to rank abstracts
     """
 
-    def __init__(self, model_client: AsyncModelClient, tokens_per_word: float = AVG_TOKEN_PER_WORD):
+    def __init__(self, model_client: AsyncModelClient, tokens_per_word: float = AVG_TOKEN_PER_WORD,
+                 ranking_cache: RankingCache = None):
         """
         Create new Abstract ranker
 
         :param model_client: Client to use for ranking abstracts
         :param tokens_per_word: Average tokens per word to use for window estimation
+        :param ranking_cache: Cache of previous rankings to reuse (Default: None)
         """
         self._model_client = model_client
         self._token_per_word = tokens_per_word
+        self._ranking_cache = ranking_cache
 
         # load content for one-shot
-        with open(RANK_CONTEXT_FILE, 'r', encoding='utf-8') as f:
-            self._rank_context = f.read()
+        self._rank_context = load_prompt(RANK_CONTEXT_FILE)
+
+    @property
+    def model(self) -> str:
+        """
+        :return: Name of the model used for ranking
+        """
+        return self._model_client.model
 
     def _estimate_tokens(self, text: str) -> int:
         """
@@ -48,22 +59,20 @@ class AbstractRanker:
         """
         return math.ceil(len(text.split()) / self._token_per_word)
 
-    def _format_context_and_prompt(self, nl_query: str, papers: List[PaperDTO]) -> Tuple[str, str]:
+    def _format_context_and_prompt(self, nl_query: str, paper_lookup: Dict[str, PaperDTO]) -> Tuple[str, str]:
         """
         Format the prompt to send to the LLM to rank the abstracts
 
         :param nl_query: Natural language search query to best match papers to
-        :param papers: List of papers to embed into the prompt
+        :param paper_lookup: Papers to embed into the prompt by their short uid
         :return: Formated prompt and context
         """
         # built prompt
-        final_prompt = "\n"
-        for p in papers:
-            final_prompt += f"id: {p.generate_short_uid()}\nAbstract:\n{p.abstract_text}\n\n"
-        final_prompt += f"Search:\n{nl_query.strip()}"
+        abstracts = "".join(f"id: {uid}\nAbstract:\n{p.abstract_text}\n\n" for uid, p in paper_lookup.items())
+        final_prompt = f"\n{abstracts}Search:\n{nl_query.strip()}"
 
         # return context and prompt
-        return self._rank_context.replace("{total_abstracts}", str(len(papers))), final_prompt
+        return self._rank_context.replace("{total_abstracts}", str(len(paper_lookup))), final_prompt
 
     async def _rank_with_llm(self, context: str, prompt: str, paper_lookup: Dict[str, PaperDTO]) -> List[PaperDTO]:
         """
@@ -80,19 +89,30 @@ class AbstractRanker:
         # if total_tokens > self._context_window_budget:
         #     logger.warn(f"Exceeded context budget by {total_tokens} tokens, ranking may be impacted")
 
+        # reuse ranking if this exact prompt was already ranked by the model
+        if self._ranking_cache:
+            cached_ranking = self._ranking_cache.get(self._model_client.model, context, prompt)
+            if cached_ranking:
+                loggy.info("Using cached ranking")
+                return [paper_lookup[uid] for uid in cached_ranking]
+
         conversation = ConversationBuilder().system(context).user(prompt).build()
         try:
             results = await self._model_client.prompt_many(conversation,
                                                            handler=JSONRetryHandler(),
                                                            retries=MAX_RETRIES,
                                                            temperature=0)
-            # convert back to dtos in order
-            return [paper_lookup[results[key]] for key in sorted(results.keys(), key=int)]
-
         except ExceededRetriesError as e:
             # error if exceed retries
             raise ExceedMaxRankingGenerationAttemptsError(self._model_client.model) from e
 
+        # convert back to dtos in order
+        ranking = [results[key] for key in sorted(results.keys(), key=int)]
+        ranked_papers = [paper_lookup[uid] for uid in ranking]
+        if self._ranking_cache:
+            self._ranking_cache.put(self._model_client.model, context, prompt, ranking)
+        return ranked_papers
+
     async def rank_paper_abstracts(self, nl_query: str, papers: List[PaperDTO]) -> List[PaperDTO]:
         """
         Rank a list of abstracts using an LLM
@@ -110,8 +130,9 @@ class AbstractRanker:
                 loggy.error("No abstracts provided, skipping ranking")
                 return papers
 
-        # format prompt
-        context, prompt = self._format_context_and_prompt(nl_query, papers)
+        # format prompt, only hash each paper id once
+        paper_lookup = {p.generate_short_uid(): p for p in papers}
+        context, prompt = self._format_context_and_prompt(nl_query, paper_lookup)
         # rank abstracts
         loggy.info(f"Ranking {len(papers)} abstracts, this may take a while")
         timer = Timer()
@@ -129,11 +150,7 @@ class AbstractRanker:
 
         hb = asyncio.create_task(__heartbeat())
         try:
-            ranked_abstracts = await self._rank_with_llm(
-                context,
-                prompt,
-                paper_lookup={p.generate_short_uid(): p for p in papers},
-            )
+            ranked_abstracts = await self._rank_with_llm(context, prompt, paper_lookup)
         finally:
             # Always stop timer and cancel heartbeat even on exceptions
             timer.stop()
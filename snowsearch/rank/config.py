@@ -9,5 +9,6 @@ Description: Defaults for Abstract ranker
 AVG_TOKEN_PER_WORD = 1.2
 TOKEN_BUFFER_MODIFIER = 1.25
 RANK_CONTEXT_FILE = "snowsearch/prompts/rank_abstract.prompt"
+RANK_CACHE_FILE = ".cache/snowsearch/rankings.db"  # relative to home directory
 
 MAX_RETRIES = 3
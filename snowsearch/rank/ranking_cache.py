@@ -0,0 +1,95 @@
+"""
+File: ranking_cache.py
+
+Description: Persistent cache of LLM abstract rankings
+
+@author Derek Garcia
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import List
+
+import loggy
+
+from rank.config import RANK_CACHE_FILE
+
+
+class RankingCache:
+    """
+    SQLite backed cache of abstract rankings by model and prompt
+    """
+
+    def __init__(self, cache_file: str = RANK_CACHE_FILE):
+        """
+        Create new ranking cache
+
+        :param cache_file: Path to the cache database relative to the home directory (Default: RANK_CACHE_FILE)
+        """
+        self._cache_file = os.path.expanduser(f"~/{cache_file}")
+        self._is_init = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Connect to the cache database, creating the table on first use
+
+        :return: Connection to the cache database
+        """
+        if not self._is_init:
+            os.makedirs(os.path.dirname(self._cache_file), exist_ok=True)
+        conn = sqlite3.connect(self._cache_file)
+        if not self._is_init:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rankings "
+                         "(model TEXT, prompt_hash TEXT, ranking TEXT, PRIMARY KEY (model, prompt_hash))")
+            self._is_init = True
+        return conn
+
+    @staticmethod
+    def _hash_prompt(context: str, prompt: str) -> str:
+        """
+        Hash the context and prompt sent to the model
+
+        :param context: LLM context with examples
+        :param prompt: Prompt with the abstracts and search
+        :return: Hex digest of the context and prompt
+        """
+        return hashlib.sha256(f"{context}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, model: str, context: str, prompt: str) -> List[str] | None:
+        """
+        Get a cached ranking
+
+        :param model: Model used for ranking
+        :param context: LLM context with examples
+        :param prompt: Prompt with the abstracts and search
+        :return: Ordered list of paper short uids, None if not cached
+        """
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute("SELECT ranking FROM rankings WHERE model = ? AND prompt_hash = ?",
+                                   (model, self._hash_prompt(context, prompt))).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            loggy.debug_warn(f"Failed to read ranking cache: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, model: str, context: str, prompt: str, ranking: List[str]) -> None:
+        """
+        Cache a ranking, failing to cache is non-fatal
+
+        :param model: Model used for ranking
+        :param context: LLM context with examples
+        :param prompt: Prompt with the abstracts and search
+        :param ranking: Ordered list of paper short uids
+        """
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("INSERT OR REPLACE INTO rankings VALUES (?, ?, ?)",
+                             (model, self._hash_prompt(context, prompt), json.dumps(ranking)))
+                conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            loggy.debug_warn(f"Failed to cache ranking: {e}")
@@ -10,10 +10,16 @@ import json
 import re
 from datetime import datetime
 from re import Match
-from typing import List
+from typing import List, Dict, Any
 
 from tabulate import tabulate
 
+# use faster json serialization if available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from db.paper_database import PaperDatabase
 from dto.paper_dto import PaperDTO
 
@@ -21,6 +27,19 @@ RED = "\033[31m"
 RESET = "\033[0m"
 
 
+def _dumps(data: Dict[Any, Any]) -> bytes:
+    """
+    Serialize data to formatted json, using orjson if available
+    orjson only supports a 2 space indent, the standard library fallback keeps the original 4 space indent
+
+    :param data: Data to serialize
+    :return: Json bytes
+    """
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=4).encode('utf-8')
+
+
 def _highlight(m: Match) -> str:
     """
     Highlight match in red
@@ -45,12 +64,11 @@ def write_papers_to_json(db: PaperDatabase, json_output: str, papers: List[Paper
     """
     # format abstracts
     results = {}
+    citation_counts = db.get_citation_counts([p.id for p in papers])
+    # calc matches if nl_query provided
+    match_scores = db.get_embedding_match_scores([p.id for p in papers], nl_query) if nl_query else {}
     for rank, paper in enumerate(papers, start=1):
-        # calc match if nl_query provided
-        if nl_query:
-            title_score, abstract_score = db.get_embedding_match_score(paper.id, nl_query)
-        else:
-            title_score, abstract_score = None, None
+        title_score, abstract_score = match_scores.get(paper.id, (None, None))
 
         # save data
         results[rank] = {
@@ -60,7 +78,7 @@ def write_papers_to_json(db: PaperDatabase, json_output: str, papers: List[Paper
             'doi': paper.doi,
             'url': paper.pdf_url,
             'openalex': paper.openalex_url,
-            'citations': len(db.get_citations(paper.id)),
+            'citations': citation_counts[paper.id],
             'abstract': paper.abstract_text
         }
     data = {
@@ -78,8 +96,8 @@ def write_papers_to_json(db: PaperDatabase, json_output: str, papers: List[Paper
 
     # write json
     json_output = json_output if json_output.endswith('.json') else f"{json_output}.json"
-    with open(json_output, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
+    with open(json_output, 'wb') as f:
+        f.write(_dumps(data))
 
     return json_output
 
@@ -110,29 +128,57 @@ def print_ranked_papers(db: PaperDatabase, papers: List[PaperDTO],
         headers.append('Abstract')
 
     table = []
+    citation_counts = db.get_citation_counts([p.id for p in papers])
+    match_scores = db.get_embedding_match_scores([p.id for p in papers], nl_query) if nl_query else {}
+    # match term is literal text, not a regex
+    match_pattern = re.compile(re.escape(exact_match), re.IGNORECASE) if exact_match else None
     for r, p in enumerate(papers, start=1):
         # highlight match if match term provided
-        title = re.sub(rf'{exact_match}', _highlight, p.id, flags=re.IGNORECASE) if exact_match else p.id
+        title = match_pattern.sub(_highlight, p.id) if match_pattern else p.id
         row = [r,
                title,
                p.is_open_access,
                p.doi,
                p.pdf_url,
                p.openalex_url,
-               len(db.get_citations(p.id))
+               citation_counts[p.id]
                ]
 
         # add score if requested
         if nl_query:
-            title_score, abstract_score = db.get_embedding_match_score(p.id, nl_query)
+            title_score, abstract_score = match_scores.get(p.id, (None, None))
             row.insert(2, f"{100 * title_score:.01f}%" if title_score else None)
             row.insert(3, f"{100 * abstract_score:.01f}%" if abstract_score else None)
 
         # add abstract if requested
         if include_abstract:
-            row.append(p.format_abstract())
+            row.append(p.formatted_abstract)
 
         table.append(row)
 
     # output table
     print(tabulate(table, headers=headers, tablefmt='fancy_grid'))
+
+
+def print_paper_details(db: PaperDatabase, paper: PaperDTO) -> None:
+    """
+    Print details of a single paper to stdout
+
+    :param db: Paper database to get additional papers details
+    :param paper: Paper to print details of
+    """
+    details = [('Title', paper.id),
+               ('Open Access', paper.is_open_access),
+               ('DOI', paper.doi),
+               ('URL', paper.pdf_url),
+               ('OpenAlex', paper.openalex_url),
+               ('Citations', db.count_citations(paper.id))]
+    # single row, so skip table formatting and align the field names
+    width = max(len(field) for field, _ in details)
+    lines = [f"{field:<{width}} │ {value}" for field, value in details]
+    # add abstract if any
+    if paper.abstract_text:
+        lines.append(f"{'Abstract':<{width}} │")
+        lines.append(paper.formatted_abstract)
+
+    print("\n".join(lines))
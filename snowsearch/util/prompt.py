@@ -0,0 +1,21 @@
+"""
+File: prompt.py
+
+Description: Util functions for loading LLM prompt files
+
+@author Derek Garcia
+"""
+
+from functools import lru_cache
+
+
+@lru_cache
+def load_prompt(prompt_file: str) -> str:
+    """
+    Load the contents of a prompt file, only reading each file once
+
+    :param prompt_file: Path to prompt file
+    :return: Contents of the prompt file
+    """
+    with open(prompt_file, 'r', encoding='utf-8') as f:
+        return f.read()
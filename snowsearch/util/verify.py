@@ -6,21 +6,27 @@ Description: Util verify functions for paper matches
 @author Derek Garcia
 """
 
-from typing import List
+from typing import List, Collection
 
-from download.config import KILOBYTE, PDF_MAGIC
+from download.config import PDF_MAGIC
 from dto.paper_dto import PaperDTO
 
 
-def validate_all_papers_found(paper_titles: List[str], found_papers: List[PaperDTO]) -> List[str]:
+def validate_all_papers_found(paper_titles: Collection[str], found_papers: List[PaperDTO]) -> List[str]:
     """
     Verify that all the papers were found in the database search
 
-    :param paper_titles: List of titles attempted to find in the database
+    :param paper_titles: Deduplicated titles attempted to find in the database
     :param found_papers: List of matching papers
-    :return: List of titles not found in the database
+    :return: List of titles not found in the database, in the order provided
     """
-    return list(set(paper_titles) - {p.id for p in found_papers})
+    # each title matches at most one paper, so equal counts means all were found
+    if len(found_papers) == len(paper_titles):
+        return []
+    # only hash the found titles, titles are already deduplicated
+    # database matches titles case-insensitively, so compare the same way
+    found_titles = {p.id.lower() for p in found_papers}
+    return [t for t in paper_titles if t.lower() not in found_titles]
 
 
 def validate_file_is_pdf(file_path: str) -> bool:
@@ -30,6 +36,6 @@ def validate_file_is_pdf(file_path: str) -> bool:
     :param file_path: Filepath to check
     :return: True if pdf, false otherwise
     """
-    with open(file_path, "rb") as f:
-        chunk = f.read(KILOBYTE)
-        return chunk.startswith(PDF_MAGIC)
+    # only the magic bytes are needed, skip buffering the rest
+    with open(file_path, "rb", buffering=0) as f:
+        return f.read(len(PDF_MAGIC)) == PDF_MAGIC